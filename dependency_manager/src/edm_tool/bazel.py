@@ -1,5 +1,5 @@
 "Bazel related functions for edm_tool."
-import yaml
+from edm_tool import yaml_io
 from typing import List, Optional, Dict
 
 
@@ -46,7 +46,7 @@ def _parse_build_file_labels(labels: Optional[List[str]]) -> Dict[str, str]:
 def generate_deps(args):
     "Parse the dependencies.yaml and print content of *.bzl file to stdout."
     with open(args.dependencies_yaml, 'r', encoding='utf-8') as f:
-        deps = yaml.safe_load(f)
+        deps = yaml_io.safe_load(f)
 
     build_files = _parse_build_file_labels(args.build_file)
 
@@ -15,18 +15,47 @@ from pathlib import Path, PurePath
 import subprocess
 import sys
 import shutil
-import multiprocessing
 import requests
 import re
 import datetime
+import fnmatch
+import time
+import threading
+import contextlib
+import hashlib
+import pickle
+import atexit
+import copy
+import collections.abc
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 from edm_tool import bazel
+from edm_tool import git_backend
+from edm_tool import yaml_io
 
 
 log = logging.getLogger("edm")
 edm_config_dir_path = Path("~/.config/everest").expanduser().resolve()
 edm_config_path = edm_config_dir_path / "edm.yaml"
+git_info_cache_path = edm_config_dir_path / "git-info-cache.json"
+remote_refs_cache_path = edm_config_dir_path / "remote-refs-cache.json"
+yaml_cache_path = edm_config_dir_path / "yaml-cache.pickle"
+mirror_cache_dir_path = edm_config_dir_path / "mirrors"
 metadata_timeout_s = 10
+fetch_timeout_s = 60
+fetch_total_timeout_s = 300
+remote_refs_ttl_s = 300
+yaml_cache_max_entries = 2000
+# additional git-clone arguments of the available clone modes
+clone_modes = {
+    "full": [],
+    "shallow": ["--depth", "1", "--single-branch"],
+    "blobless": ["--filter=blob:none"],
+    "treeless": ["--filter=tree:0"],
+}
+dependencies_file_names = ["dependencies.yaml", "dependencies.yml"]
+# directories that are never scanned for dependencies files
+scan_pruned_dir_names = [".git", "node_modules", "__pycache__"]
 
 
 class LocalDependencyCheckoutError(Exception):
@@ -122,19 +151,6 @@ def quote(lst: list) -> list:
     return [f"\"{element}\"" for element in lst]
 
 
-def prettify(lst: list, indent: int) -> str:
-    """Construct string from list elements with the given indentation."""
-    output = ""
-    space = " " * indent
-    for out in lst:
-        if out and out != "\n":
-            if len(output) > 0:
-                output += f"\n{space}{out}"
-            else:
-                output += f"{space}{out}"
-    return output
-
-
 def pretty_print(lst: list, indent: int, log_level: int):
     """Debug log every list element with the given indentation."""
     space = " " * indent
@@ -163,6 +179,106 @@ def pretty_print_process(c: subprocess.CompletedProcess, indent: int, log_level:
     pretty_print(stderr, indent, log_level)
 
 
+def get_env_int(name: str, default: int = None, minimum: int = 0) -> int:
+    """Return the integer value of environment variable name, or default if it is unset, invalid or below minimum."""
+    value = os.environ.get(name)
+    if value:
+        try:
+            if int(value) >= minimum:
+                return int(value)
+        except ValueError:
+            pass
+        log.warning(f"Ignoring invalid {name} value \"{value}\"")
+    return default
+
+
+def get_job_count(jobs: int = None) -> int:
+    """
+    Return the number of concurrent jobs to use.
+
+    If jobs is not set the EVEREST_EDM_JOBS environment variable is used, defaulting to the number of CPUs.
+    """
+    if jobs is not None and jobs > 0:
+        return jobs
+    return get_env_int("EVEREST_EDM_JOBS", os.cpu_count() or 1, minimum=1)
+
+
+def map_concurrently(function, items: list, jobs: int = None) -> list:
+    """
+    Return the results of calling function with every item of items in order, up to jobs calls at a time.
+
+    If a call raises or the caller is interrupted the calls that did not start yet are cancelled before re-raising.
+    """
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(get_job_count(jobs), len(items))) as executor:
+        futures = []
+        try:
+            for item in items:
+                futures.append(executor.submit(function, item))
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def get_yaml_cache_size() -> int:
+    """Return the maximum number of yaml cache entries from EVEREST_EDM_YAML_CACHE_SIZE, 0 disables the cache."""
+    return get_env_int("EVEREST_EDM_YAML_CACHE_SIZE", yaml_cache_max_entries)
+
+
+class LogBuffer(logging.Filter):
+    """Log filter that holds back the records of threads that capture their log output."""
+
+    def __init__(self):
+        """Initialize the filter without any capturing threads."""
+        super().__init__()
+        self.local = threading.local()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Buffer the record if the current thread captures its log output."""
+        records = getattr(self.local, "records", None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Buffer the log records of the current thread in the yielded list instead of emitting them."""
+        self.local.records = []
+        try:
+            yield self.local.records
+        finally:
+            self.local.records = None
+
+    @classmethod
+    def emit(cls, records: list):
+        """Emit the given buffered records."""
+        for record in records:
+            log.handle(record)
+
+
+def parse_size(size: str) -> int:
+    """Parse a size in bytes with an optional K, M, G or T suffix like "20G"."""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    size = size.strip().upper().rstrip("B")
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    """Format a size in bytes in a human readable way."""
+    for unit in ["B", "K", "M", "G"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
 def pattern_matches(string: str, patterns: list) -> bool:
     """Return true if one of the patterns match with the string, false otherwise."""
     matches = False
@@ -174,8 +290,762 @@ def pattern_matches(string: str, patterns: list) -> bool:
     return matches
 
 
+def load_or_default(path: Path, load, default):
+    """
+    Return the result of calling load with the file at path opened in binary mode, e.g. json.load or pickle.load.
+
+    If the file does not exist or can not be loaded default is returned instead.
+    """
+    if not path.exists():
+        return default
+    try:
+        with open(path, 'rb') as data_file:
+            return load(data_file)
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError) as e:
+        log.debug(f"Ignoring unreadable \"{path}\": {e}")
+        return default
+
+
+def write_file_atomically(path: Path, data: bytes) -> bool:
+    """
+    Write data to path by replacing it with a temporary file, so that readers never see a partially written file.
+
+    Returns false if the file could not be written.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        log.debug(f"Could not write \"{path}\": {e}")
+        with contextlib.suppress(OSError):
+            tmp_path.unlink()
+        return False
+
+
+class GitInfoCache:
+    """
+    On-disk cache of GitInfo.get_git_repo_info results.
+
+    Entries are keyed on a cheap fingerprint of the files in the .git directory that change whenever HEAD,
+    the index, the refs or the config of a repository change. Whether the working tree is dirty can not be
+    derived from these files, so the "dirty" and "fetch_worked" entries are never cached.
+    """
+
+    uncached_keys = ("dirty", "fetch_worked")
+
+    def __init__(self, cache_path: Path = git_info_cache_path):
+        """Initialize the cache by loading cache_path if it exists."""
+        self.cache_path = cache_path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.entries = load_or_default(cache_path, json.load, {})
+
+    @classmethod
+    def fingerprint(cls, repo_path: Path, remote_branch: str) -> list:
+        """
+        Return the size and mtime of all files in the .git directory that describe the state of the repo.
+
+        Loose tags can be nested in directories below refs/tags, so their number and newest mtime are used.
+        """
+        git_dir = repo_path / ".git"
+        paths = [git_dir / "HEAD", git_dir / "index", git_dir / "packed-refs", git_dir / "config"]
+        try:
+            with open(git_dir / "HEAD", encoding='utf-8') as head_file:
+                head = head_file.read().strip()
+            if head.startswith("ref: "):
+                paths.append(git_dir / head.replace("ref: ", "", 1))
+        except OSError:
+            pass
+        if remote_branch:
+            paths.append(git_dir / "refs" / "remotes" / remote_branch)
+        fingerprint = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                fingerprint.append([path.name, stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                fingerprint.append([path.name, None, None])
+        tag_count = 0
+        newest_tag_mtime = None
+        for dir_path, _, file_names in os.walk(git_dir / "refs" / "tags"):
+            for file_name in file_names:
+                try:
+                    mtime = os.stat(os.path.join(dir_path, file_name)).st_mtime_ns
+                except OSError:
+                    continue
+                tag_count += 1
+                newest_tag_mtime = mtime if newest_tag_mtime is None else max(newest_tag_mtime, mtime)
+        fingerprint.append(["tags", tag_count, newest_tag_mtime])
+        return fingerprint
+
+    def get(self, repo_path: Path) -> dict:
+        """Return the cached info of the repo at repo_path if its fingerprint did not change, None otherwise."""
+        key = repo_path.resolve().as_posix()
+        with self.lock:
+            entry = self.entries.get(key)
+        if (entry is not None and
+                entry["fingerprint"] == GitInfoCache.fingerprint(repo_path, entry["info"]["remote_branch"])):
+            with self.lock:
+                self.hits += 1
+            return dict(entry["info"])
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, repo_path: Path, repo_info: dict):
+        """
+        Store the given repo_info of the repo at repo_path.
+
+        Branches without an existing upstream branch are not cached, because the fingerprint would not
+        notice if a git-fetch creates the upstream branch.
+        """
+        if repo_info["branch"] and not repo_info["remote_branch"]:
+            return
+        info = {key: repo_info[key] for key in repo_info.keys() if key not in GitInfoCache.uncached_keys}
+        entry = {"fingerprint": GitInfoCache.fingerprint(repo_path, info["remote_branch"]), "info": info}
+        with self.lock:
+            self.entries[repo_path.resolve().as_posix()] = entry
+
+    def save(self):
+        """Save the cache to disk, dropping entries of repositories that do not exist anymore."""
+        log.debug(f"git info cache: {self.hits} hits, {self.misses} misses")
+        self.entries = {key: entry for key, entry in self.entries.items() if (Path(key) / ".git").is_dir()}
+        write_file_atomically(self.cache_path, json.dumps(self.entries).encode("utf-8"))
+
+
+class YamlCache:
+    """
+    On-disk cache of parsed yaml files.
+
+    Entries are keyed on the resolved path of a file and validated with its size, mtime and inode, so unchanged files
+    are loaded from their pickled data without parsing the yaml. Files modified in the last racy_time_s seconds are
+    not cached, because a further modification within the resolution of the mtime would go unnoticed.
+    At most max_entries entries are kept, least recently used first, entries of changed or removed files are evicted.
+    Last use times are only refreshed once they are older than used_resolution_s, so cache hits rarely need a save.
+    """
+
+    racy_time_s = 2
+    used_resolution_s = 24 * 60 * 60
+
+    def __init__(self, cache_path: Path = yaml_cache_path, max_entries: int = None):
+        """
+        Initialize the cache at cache_path, it is only loaded when it is used the first time.
+
+        If max_entries is not set it is taken from the environment on first use, see get_yaml_cache_size.
+        """
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.entries = None
+        self.modified = False
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_key(cls, stat: os.stat_result) -> tuple:
+        """Return the key that changes whenever the file with the given stat result changes."""
+        return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def load(self):
+        """Load the cache from disk if this did not happen yet."""
+        if self.entries is not None:
+            return
+        entries = load_or_default(self.cache_path, pickle.load, {})
+        self.entries = entries if isinstance(entries, dict) else {}
+
+    def load_file(self, path: Path):
+        """
+        Return the parsed yaml of the file at path, loading it from the cache if the file did not change.
+
+        Like yaml.safe_load this raises yaml.YAMLError if the file can not be parsed, which is not cached.
+        """
+        stat = path.stat()
+        if self.max_entries is None:
+            self.max_entries = get_yaml_cache_size()
+        if self.max_entries <= 0:
+            with open(path, encoding='utf-8') as yaml_file:
+                return yaml_io.safe_load(yaml_file)
+        cache_key = path.resolve().as_posix()
+        key = YamlCache.get_key(stat)
+        with self.lock:
+            self.load()
+            entry = self.entries.get(cache_key)
+            if entry is not None and entry["key"] == key:
+                now = time.time()
+                if now - entry["used"] >= YamlCache.used_resolution_s:
+                    entry["used"] = now
+                    self.modified = True
+                # every caller gets its own copy which it may modify
+                return pickle.loads(entry["data"])
+        with open(path, encoding='utf-8') as yaml_file:
+            data = yaml_io.safe_load(yaml_file)
+        if time.time() - stat.st_mtime >= YamlCache.racy_time_s:
+            with self.lock:
+                self.entries[cache_key] = {"key": key, "used": time.time(),
+                                           "data": pickle.dumps(data, pickle.HIGHEST_PROTOCOL)}
+                self.modified = True
+        return data
+
+    def save(self):
+        """Save the cache to disk if it was used, dropping stale and the least recently used entries."""
+        if not self.modified:
+            return
+        entries = {}
+        for cache_key, entry in sorted(self.entries.items(), key=lambda item: item[1]["used"], reverse=True):
+            if len(entries) >= self.max_entries:
+                break
+            try:
+                if YamlCache.get_key(os.stat(cache_key)) == entry["key"]:
+                    entries[cache_key] = entry
+            except OSError:
+                pass
+        if write_file_atomically(self.cache_path, pickle.dumps(entries, pickle.HIGHEST_PROTOCOL)):
+            self.modified = False
+
+
+yaml_cache = YamlCache()
+atexit.register(yaml_cache.save)
+
+
+def load_yaml_file(path: Path):
+    """Return the parsed yaml of the file at path using the yaml cache, raises yaml.YAMLError on parse errors."""
+    return yaml_cache.load_file(path)
+
+
+class RemoteRefsCache:
+    """
+    On-disk cache of the branches and tags advertised by remotes, keyed on the remote url.
+
+    Listings are reused for ttl seconds, or never if refresh is set, but every remote is listed at most once per run.
+    New listings are saved once, when edm exits.
+    """
+
+    def __init__(self, cache_path: Path = remote_refs_cache_path, ttl: float = None):
+        """
+        Initialize the cache, which is loaded from cache_path on first use.
+
+        If ttl is not set it is taken from the EVEREST_EDM_REMOTE_REFS_TTL environment variable on first use,
+        defaulting to remote_refs_ttl_s.
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.refresh = False
+        self.entries = None
+        self.listed_urls = set()
+        self.failed_urls = set()
+        self.modified = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Load the cache from disk if this did not happen yet."""
+        if self.entries is not None:
+            return
+        if self.ttl is None:
+            self.ttl = get_env_int("EVEREST_EDM_REMOTE_REFS_TTL", remote_refs_ttl_s)
+        self.entries = load_or_default(self.cache_path, json.load, {})
+
+    def save(self):
+        """Save the cache to disk if refs were listed, dropping entries that are expired."""
+        if not self.modified:
+            return
+        now = time.time()
+        entries = {url: entry for url, entry in self.entries.items() if now - entry["time"] < self.ttl}
+        if write_file_atomically(self.cache_path, json.dumps(entries).encode("utf-8")):
+            self.modified = False
+
+    def get_cached_refs(self, remote_url: str) -> list:
+        """Return the cached refs of remote_url if they are still valid, None otherwise."""
+        with self.lock:
+            self.load()
+            entry = self.entries.get(remote_url)
+            if entry is not None and (remote_url in self.listed_urls or
+                                      (not self.refresh and time.time() - entry["time"] < self.ttl)):
+                return entry["refs"]
+        return None
+
+    def set_refs(self, remote_url: str, refs: list):
+        """Store the refs of remote_url listed in this run, refs is None if the remote could not be listed."""
+        with self.lock:
+            self.load()
+            self.listed_urls.add(remote_url)
+            if refs is None:
+                self.failed_urls.add(remote_url)
+                return
+            self.entries[remote_url] = {"time": time.time(), "refs": refs}
+            self.modified = True
+
+    @classmethod
+    def list_refs(cls, remote_url: str) -> list:
+        """
+        Return the [rev, refname] pairs listed by git-ls-remote for remote_url, or None if this fails.
+
+        The refs are sorted by descending version with prereleases ("-" suffixes) before their release.
+        """
+        try:
+            result = subprocess.run(["git", "-c", "versionsort.suffix=-", "ls-remote", "--sort=-v:refname", "--quiet",
+                                     remote_url, "HEAD", "refs/heads/*", "refs/tags/*"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        except subprocess.CalledProcessError:
+            return None
+        refs = []
+        for line in result.stdout.decode("utf-8").split("\n"):
+            rev_and_ref = line.split("\t")
+            if len(rev_and_ref) > 1:
+                refs.append(rev_and_ref[:2])
+        return refs
+
+    def get_refs(self, remote_url: str) -> list:
+        """
+        Return a list of [rev, refname] pairs of HEAD, all branches and all tags, including peeled tags, of remote_url.
+
+        The list keeps the version order of list_refs, None is returned if the remote could not be listed.
+        """
+        refs = self.get_cached_refs(remote_url)
+        if refs is not None:
+            log.debug(f"Using cached refs of \"{remote_url}\"")
+            return refs
+        if remote_url in self.failed_urls:
+            return None
+        log.debug(f"Listing refs of \"{remote_url}\"")
+        refs = RemoteRefsCache.list_refs(remote_url)
+        self.set_refs(remote_url, refs)
+        return refs
+
+
+class MirrorCache:
+    """
+    Directory of bare mirrors of remote repositories, keyed on the normalized remote url.
+
+    Clones are served from the mirrors, which are updated once per run with git-fetch.
+    If shared is set clones borrow the objects of the mirrors via git alternates instead of copying them.
+    Mirrors that were not used for max_age days or exceed a total size of max_size bytes, least recently used first,
+    are evicted by prune, unless a clone still borrows their objects.
+    """
+
+    last_used_file_name = "edm-last-used"
+    references_file_name = "edm-references"
+
+    def __init__(self, path: Path = mirror_cache_dir_path, max_size: int = None, max_age: float = None,
+                 shared=False):
+        """Initialize the mirror cache in the directory at path."""
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.shared = shared
+        self.updated = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, enabled: bool, shared=False):
+        """
+        Return a MirrorCache if enabled, shared or the EVEREST_EDM_MIRROR_CACHE environment variable is set, else None.
+
+        EVEREST_EDM_MIRROR_CACHE contains the directory of the mirrors, their limits are set by the
+        EVEREST_EDM_MIRROR_CACHE_MAX_SIZE and EVEREST_EDM_MIRROR_CACHE_MAX_AGE environment variables.
+        """
+        env_path = os.environ.get("EVEREST_EDM_MIRROR_CACHE")
+        if not env_path and not enabled and not shared:
+            return None
+        path = Path(env_path).expanduser().resolve() if env_path else mirror_cache_dir_path
+        max_size = None
+        max_age = None
+        try:
+            if os.environ.get("EVEREST_EDM_MIRROR_CACHE_MAX_SIZE"):
+                max_size = parse_size(os.environ["EVEREST_EDM_MIRROR_CACHE_MAX_SIZE"])
+            if os.environ.get("EVEREST_EDM_MIRROR_CACHE_MAX_AGE"):
+                max_age = float(os.environ["EVEREST_EDM_MIRROR_CACHE_MAX_AGE"])
+        except ValueError as e:
+            log.warning(f"Ignoring invalid mirror cache limit: {e}")
+        return MirrorCache(path, max_size, max_age, shared)
+
+    @classmethod
+    def normalize_url(cls, url: str) -> str:
+        """
+        Return the host and path of the given remote url, so that different urls of the same repo share a mirror.
+
+        For example "git@github.com:EVerest/everest-core.git" and "https://github.com/EVerest/everest-core"
+        are both normalized to "github.com/EVerest/everest-core".
+        """
+        url = url.strip().rstrip("/")
+        if url.endswith(".git"):
+            url = url[:-len(".git")]
+        match = re.match(r"^([a-zA-Z][a-zA-Z0-9+.-]*)://(?:[^@/]*@)?([^/]*)(.*)$", url)
+        if match:
+            host = "" if match.group(1).lower() == "file" else match.group(2).split(":")[0].lower()
+            return host + "/" + match.group(3).strip("/")
+        match = re.match(r"^(?:[^@/]+@)?([^/:]+):(.*)$", url)
+        if match:
+            return match.group(1).lower() + "/" + match.group(2).strip("/")
+        return Path(url).expanduser().resolve().as_posix()
+
+    def get_mirror_path(self, url: str) -> Path:
+        """Return the path of the mirror of the given remote url."""
+        key = MirrorCache.normalize_url(url)
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", key).strip("_")
+        return self.path / f"{name}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}.git"
+
+    def get_mirror(self, url: str) -> Path:
+        """
+        Return the path of an up to date mirror of the given remote url, creating or updating it if necessary.
+
+        Returns None if the mirror could not be created
+        """
+        mirror_path = self.get_mirror_path(url)
+        with self.lock:
+            mirror_lock = self.locks.setdefault(mirror_path, threading.Lock())
+        with mirror_lock:
+            if mirror_path not in self.updated:
+                self.updated[mirror_path] = self.update_mirror(url, mirror_path)
+            if not self.updated[mirror_path]:
+                return None
+            (mirror_path / MirrorCache.last_used_file_name).touch()
+        return mirror_path
+
+    def add_reference(self, mirror_path: Path, checkout_dir: Path):
+        """Record that the clone at checkout_dir borrows the objects of the mirror at mirror_path."""
+        with self.locks[mirror_path]:
+            try:
+                # objects that become unreachable in the mirror might still be needed by the clone
+                subprocess.run(["git", "-C", mirror_path, "config", "gc.pruneExpire", "never"],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            except subprocess.CalledProcessError as e:
+                pretty_print(e.stderr.decode().strip().split("\n"), 4, logging.DEBUG)
+            references_path = mirror_path / MirrorCache.references_file_name
+            references = references_path.read_text(encoding="utf-8").split("\n") if references_path.exists() else []
+            if checkout_dir.as_posix() not in references:
+                with open(references_path, "a", encoding="utf-8") as references_file:
+                    references_file.write(f"{checkout_dir.as_posix()}\n")
+
+    @classmethod
+    def get_references(cls, mirror_path: Path) -> list:
+        """Return the paths of the clones that still borrow the objects of the mirror at mirror_path."""
+        references_path = mirror_path / MirrorCache.references_file_name
+        if not references_path.exists():
+            return []
+        objects_path = (mirror_path / "objects").as_posix()
+        references = []
+        for reference in references_path.read_text(encoding="utf-8").split("\n"):
+            alternates_path = Path(reference) / ".git" / "objects" / "info" / "alternates"
+            if reference and alternates_path.exists():
+                if objects_path in alternates_path.read_text(encoding="utf-8").split("\n"):
+                    references.append(Path(reference))
+        return references
+
+    @classmethod
+    def dissociate(cls, checkout_dir: Path) -> bool:
+        """
+        Copy all objects the clone at checkout_dir borrows via git alternates into the clone and stop borrowing them.
+
+        Returns true if the clone borrowed objects and is now standalone
+        """
+        alternates_path = checkout_dir / ".git" / "objects" / "info" / "alternates"
+        if not alternates_path.exists():
+            return False
+        try:
+            result = subprocess.run(["git", "-C", checkout_dir, "repack", "-a", "-d", "-q"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            pretty_print_process(result, 4, logging.DEBUG)
+        except subprocess.CalledProcessError as e:
+            log.warning(f"Could not copy the borrowed objects into \"{checkout_dir.name}\":")
+            pretty_print(e.stderr.decode().strip().split("\n"), 4, logging.WARNING)
+            return False
+        alternates_path.unlink()
+        return True
+
+    @classmethod
+    def update_mirror(cls, url: str, mirror_path: Path) -> bool:
+        """Fetch into the mirror at mirror_path or create it by cloning url, return true if the mirror can be used."""
+        if mirror_path.exists():
+            log.debug(f"    Updating mirror \"{mirror_path.name}\"")
+            try:
+                result = subprocess.run(["git", "-C", mirror_path, "fetch", "--prune", "origin"],
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                pretty_print_process(result, 4, logging.DEBUG)
+            except subprocess.CalledProcessError as e:
+                log.warning(f"    Could not update mirror of \"{url}\", using the existing mirror:")
+                pretty_print(e.stderr.decode().strip().split("\n"), 6, logging.WARNING)
+            return True
+        log.debug(f"    Creating mirror \"{mirror_path.name}\"")
+        tmp_mirror_path = mirror_path.with_name(f"{mirror_path.name}.{os.getpid()}.tmp")
+        try:
+            mirror_path.parent.mkdir(parents=True, exist_ok=True)
+            result = subprocess.run(["git", "clone", "--mirror", url, tmp_mirror_path],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            pretty_print_process(result, 4, logging.DEBUG)
+            # allow shallow and partial clones from the mirror
+            for option in ["uploadpack.allowFilter", "uploadpack.allowAnySHA1InWant"]:
+                subprocess.run(["git", "-C", tmp_mirror_path, "config", option, "true"],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            os.replace(tmp_mirror_path, mirror_path)
+        except subprocess.CalledProcessError as e:
+            log.debug(f"    Could not create mirror of \"{url}\":")
+            pretty_print(e.stderr.decode().strip().split("\n"), 6, logging.DEBUG)
+            return False
+        except OSError as e:
+            log.debug(f"    Could not create mirror of \"{url}\": {e}")
+            return False
+        finally:
+            shutil.rmtree(tmp_mirror_path, ignore_errors=True)
+        return True
+
+    def get_mirrors(self) -> list:
+        """
+        Return a dictionary with path, url, size, last_used time and references of every mirror.
+
+        The mirrors are sorted most recently used first
+        """
+        mirrors = []
+        if not self.path.is_dir():
+            return mirrors
+        for mirror_path in self.path.glob("*.git"):
+            try:
+                result = subprocess.run(["git", "-C", mirror_path, "config", "--get", "remote.origin.url"],
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                url = result.stdout.decode("utf-8").strip()
+            except subprocess.CalledProcessError:
+                url = None
+            size = 0
+            for dir_path, _, file_names in os.walk(mirror_path):
+                for file_name in file_names:
+                    try:
+                        size += os.lstat(os.path.join(dir_path, file_name)).st_size
+                    except OSError:
+                        pass
+            last_used_path = mirror_path / MirrorCache.last_used_file_name
+            last_used = last_used_path.stat().st_mtime if last_used_path.exists() else mirror_path.stat().st_mtime
+            mirrors.append({"path": mirror_path, "url": url, "size": size, "last_used": last_used,
+                            "references": MirrorCache.get_references(mirror_path)})
+        mirrors.sort(key=lambda mirror: mirror["last_used"], reverse=True)
+        return mirrors
+
+    def prune(self, max_size: int = None, max_age: float = None, remove_all=False) -> list:
+        """
+        Remove mirrors that were not used for max_age days and the least recently used mirrors exceeding max_size bytes.
+
+        The limits of the cache are used if max_size or max_age are None.
+        Returns the removed mirrors
+        """
+        if max_size is None:
+            max_size = self.max_size
+        if max_age is None:
+            max_age = self.max_age
+        removed = []
+        total_size = 0
+        now = time.time()
+        for mirror in self.get_mirrors():
+            total_size += mirror["size"]
+            if (remove_all or (max_age is not None and now - mirror["last_used"] > max_age * 24 * 60 * 60) or
+                    (max_size is not None and total_size > max_size)):
+                if mirror["references"]:
+                    log.debug(f"Keeping mirror \"{mirror['path'].name}\" which is used by "
+                              f"{len(mirror['references'])} clones")
+                    continue
+                log.debug(f"Removing mirror \"{mirror['path'].name}\"")
+                shutil.rmtree(mirror["path"], ignore_errors=True)
+                # a removed mirror is created again when it is used later
+                self.updated.pop(mirror["path"], None)
+                total_size -= mirror["size"]
+                removed.append(mirror)
+        return removed
+
+
+class SetupJournal:
+    """
+    Journal of the planned, in-progress, done and failed checkouts of a workspace setup.
+
+    The journal is stored in the workspace until the setup succeeded. If resume is set the checkouts that are done
+    according to the journal of an interrupted setup are skipped, unless their git url, git_tag or git_rev changed.
+    """
+
+    file_name = ".edm-setup-journal.json"
+    checkout_keys = ("git", "git_tag", "git_rev")
+
+    def __init__(self, workspace_path: Path, resume=False):
+        """Initialize the journal of the workspace at workspace_path, loading the existing journal if resume is set."""
+        self.path = workspace_path / SetupJournal.file_name
+        self.entries = {}
+        self.lock = threading.Lock()
+        if not self.path.exists():
+            if resume:
+                log.info(f"No interrupted setup to resume in \"{workspace_path}\"")
+            return
+        if not resume:
+            log.warning(f"A previous setup of \"{workspace_path}\" was interrupted, use --resume to continue it.")
+            return
+        entries = load_or_default(self.path, json.load, None)
+        if not isinstance(entries, dict):
+            log.warning(f"Ignoring unreadable setup journal \"{self.path}\"")
+            return
+        self.entries = entries
+        done_count = len([entry for entry in self.entries.values() if entry.get("state") == "done"])
+        log.info(f"Resuming interrupted setup, {done_count}/{len(self.entries)} checkouts are already done")
+
+    def save(self):
+        """Save the journal to disk."""
+        write_file_atomically(self.path, json.dumps(self.entries, indent=2).encode("utf-8"))
+
+    def set_state(self, checkout: dict, state: str, result: dict = None):
+        """Record the state of the given checkout, the result of a done checkout is recorded as well."""
+        with self.lock:
+            entry = {"state": state, "checkout": {key: checkout.get(key) for key in SetupJournal.checkout_keys}}
+            if result is not None:
+                entry["result"] = {"name": result["name"], "path": result["path"].as_posix(),
+                                   "git_tag": result["git_tag"]}
+            self.entries[checkout["name"]] = entry
+            self.save()
+
+    def get_result(self, checkout: dict) -> dict:
+        """Return the recorded result of the given checkout if it is done with the same source, None otherwise."""
+        with self.lock:
+            entry = self.entries.get(checkout["name"])
+            if entry is None or entry["state"] != "done" or not Path(entry["result"]["path"]).is_dir():
+                return None
+            if entry.get("checkout") != {key: checkout.get(key) for key in SetupJournal.checkout_keys}:
+                return None
+            return {**entry["result"], "path": Path(entry["result"]["path"])}
+
+    def remove(self):
+        """Remove the journal after a successful setup."""
+        with self.lock:
+            self.entries = {}
+            if self.path.exists():
+                self.path.unlink()
+
+
+class RepoInfo:
+    """
+    Information about the git repository at a given path, every field is queried on first access and memoised.
+
+    Related fields that come from the same git call are filled in together. Fields can be accessed as attributes
+    or like dictionary items, all fields are None if the path is no git repo.
+    """
+
+    fields = ("is_repo", "fetch_worked", "remote_branch", "behind", "ahead", "tag", "branch", "dirty",
+              "detached", "rev", "short_rev", "url")
+    __slots__ = ("path",) + fields
+
+    def __init__(self, path: Path, **values):
+        """Initialize the info of the repo at path, values contains already known fields."""
+        self.path = Path(path)
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def __getattr__(self, name: str):
+        """Query a field that was not accessed before."""
+        if name not in RepoInfo.fields:
+            raise AttributeError(name)
+        self.query(name)
+        return object.__getattribute__(self, name)
+
+    def is_loaded(self, name: str) -> bool:
+        """Return true if the given field is already known."""
+        try:
+            object.__getattribute__(self, name)
+            return True
+        except AttributeError:
+            return False
+
+    def set_missing(self, values: dict):
+        """Set the given fields unless they are already known."""
+        for key, value in values.items():
+            if not self.is_loaded(key):
+                setattr(self, key, value)
+
+    def query(self, name: str):
+        """Query the given field and all fields that come from the same git call."""
+        if name == "is_repo":
+            # a top-level repo has a .git directory, this check saves a git-rev-parse call for every other directory
+            self.is_repo = (self.path / ".git" / "HEAD").is_file()
+        elif not self.is_repo or name == "fetch_worked":
+            setattr(self, name, None)
+        elif name in ("ahead", "behind"):
+            status = GitInfo.get_status(self.path)
+            self.set_missing(status if status else {"ahead": "", "behind": ""})
+        elif name in ("short_rev", "tag"):
+            (short_rev, tag) = GitInfo.get_short_rev_and_tag(self.path)
+            self.set_missing({"short_rev": short_rev, "tag": tag})
+        elif name == "dirty":
+            self.dirty = GitInfo.is_dirty(self.path)
+        elif name == "remote_branch":
+            self.remote_branch = GitInfo.get_remote_branch(self.path)
+        elif name == "branch":
+            self.branch = GitInfo.get_branch(self.path)
+        elif name == "detached":
+            self.detached = GitInfo.is_detached(self.path)
+        elif name == "rev":
+            self.rev = GitInfo.get_current_rev(self.path)
+        elif name == "url":
+            self.url = GitInfo.get_remote_url(self.path)
+
+    def load(self, fields: tuple = None):
+        """Query the given fields, or all fields if None, now instead of on first access."""
+        for name in fields if fields is not None else RepoInfo.fields:
+            getattr(self, name)
+
+    def __getitem__(self, key: str):
+        """Return the given field like a dictionary item."""
+        if key not in RepoInfo.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        """Set the given field like a dictionary item."""
+        if key not in RepoInfo.fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        """Return true if key is a field."""
+        return key in RepoInfo.fields
+
+    def __iter__(self):
+        """Iterate over the field names."""
+        return iter(RepoInfo.fields)
+
+    def __len__(self) -> int:
+        """Return the number of fields."""
+        return len(RepoInfo.fields)
+
+    def __eq__(self, other) -> bool:
+        """Compare all fields with another RepoInfo or dictionary."""
+        if isinstance(other, (RepoInfo, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        """Return the known fields."""
+        known = ", ".join(f"{key}={getattr(self, key)!r}" for key in RepoInfo.fields if self.is_loaded(key))
+        return f"RepoInfo({self.path.as_posix()!r}, {known})"
+
+    def keys(self) -> tuple:
+        """Return the field names."""
+        return RepoInfo.fields
+
+    def items(self) -> list:
+        """Return (name, value) pairs of all fields, querying all of them."""
+        return [(key, getattr(self, key)) for key in RepoInfo.fields]
+
+    def get(self, key: str, default=None):
+        """Return the given field or default if key is no field."""
+        if key not in RepoInfo.fields:
+            return default
+        return getattr(self, key)
+
+
 class GitInfo:
-    """Provide information about git repositories."""
+    """
+    Provide information about git repositories.
+
+    Read-only ref queries are answered by the backend, which reads the repository files directly if possible.
+    """
+
+    backend = git_backend.create_backend()
+    remote_refs = RemoteRefsCache()
 
     @classmethod
     def is_repo(cls, path: Path) -> bool:
@@ -192,84 +1062,90 @@ class GitInfo:
 
     @classmethod
     def is_dirty(cls, path: Path) -> bool:
-        """Use git diff to check if the provided directory has uncommitted changes, ignoring untracked files."""
+        """Use git status to check if the provided directory has uncommitted changes, ignoring untracked files."""
         try:
-            subprocess.run(["git", "-C", path, "diff", "--quiet", "--exit-code"],
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            subprocess.run(["git", "-C", path, "diff", "--cached", "--quiet", "--exit-code"],
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return False
+            result = subprocess.run(["git", "--no-optional-locks", "-C", path, "status",
+                                     "--porcelain", "--untracked-files=no"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            return len(result.stdout) > 0
         except subprocess.CalledProcessError:
             return True
 
     @classmethod
     def is_detached(cls, path: Path) -> bool:
         """Check if the git repo at path is in detached HEAD state."""
-        try:
-            subprocess.run(["git", "-C", path, "symbolic-ref", "-q", "HEAD"],
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return False
-        except subprocess.CalledProcessError:
-            return True
+        return GitInfo.backend.is_detached(path)
 
     @classmethod
-    def fetch(cls, path: Path) -> bool:
+    def fetch(cls, path: Path, timeout: float = None) -> bool:
         """
-        Return true if git-fetch was successful, false if not.
+        Return true if git-fetch was successful, false if not or if it did not finish within timeout seconds.
 
         TODO: distinguish between error codes?
         """
         log.debug(f"\"{path.name}\": fetching information from remote. This might take a few seconds.")
         try:
             subprocess.run(["git", "-C", path, "fetch"],
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=timeout)
             return True
         except subprocess.CalledProcessError as result:
             log.error(f"\"{path.name}\" Error during git-fetch: {result.returncode}")
             return False
+        except subprocess.TimeoutExpired:
+            log.warning(f"\"{path.name}\" git-fetch did not finish within {timeout:.0f}s, remote information is stale.")
+            return False
 
     @classmethod
-    def pull(cls, path: Path) -> bool:
+    def fetch_all(cls, repo_paths: list, jobs: int = None,
+                  timeout: float = fetch_timeout_s, total_timeout: float = fetch_total_timeout_s) -> dict:
         """
-        Return true if git-pull was successful, false if not.
+        Fetch all repositories at the given paths concurrently and return a dictionary of the fetch results.
 
-        TODO: distinguish between error codes?
+        At most jobs fetches are in flight at the same time, each fetch is aborted after timeout seconds.
+        Fetches that cannot finish before the overall total_timeout expires are aborted or not started at all.
+        """
+        if not repo_paths:
+            return {}
+        deadline = time.monotonic() + total_timeout
+
+        def fetch_before_deadline(repo_path: Path) -> bool:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log.warning(f"\"{repo_path.name}\" git-fetch skipped because the overall fetch deadline of "
+                            f"{total_timeout:.0f}s passed, remote information is stale.")
+                return False
+            return GitInfo.fetch(repo_path, min(timeout, remaining))
+
+        fetch_results = map_concurrently(fetch_before_deadline, repo_paths, jobs)
+        return dict(zip(repo_paths, fetch_results))
+
+    @classmethod
+    def pull_repo(cls, path: Path, skip_dirty=False) -> dict:
         """
+        Pull the repo at path and return a dictionary describing the outcome without logging errors.
+
+        "pull_result" is one of "pulled", "up-to-date", "failed" or "skipped-dirty",
+        the stderr of a failed git-pull is kept in "pull_stderr".
+        """
+        pull_info = {'is_repo': True, 'pull_worked': False, 'pull_result': "failed",
+                     'pull_returncode': 0, 'pull_stderr': ""}
+        status = GitInfo.get_status(path)
+        if skip_dirty and status.get("dirty"):
+            pull_info["pull_result"] = "skipped-dirty"
+            return pull_info
         log.info(f"\"{path.name}\": pulling from remote. This might take a few seconds.")
         try:
             subprocess.run(["git", "-C", path, "pull"],
                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return True
         except subprocess.CalledProcessError as result:
-            pretty_stderr = prettify(result.stderr.decode("utf-8").split("\n"), 4)
-            log.error(f"\"{path.name}\" Error during git-pull: {result.returncode}\n{pretty_stderr}")
-            return False
-
-    @classmethod
-    def get_behind(cls, path: Path) -> str:
-        """Return how many commits behind the repo at path is relative to remote."""
-        behind = ""
-        try:
-            result = subprocess.run(["git", "-C", path, "rev-list", "--count", "HEAD..@{u}"],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            behind = result.stdout.decode("utf-8").replace("\n", "")
-        except subprocess.CalledProcessError:
-            return behind
-
-        return behind
-
-    @classmethod
-    def get_ahead(cls, path: Path) -> str:
-        """Return how many commits ahead the repo at path is relative to remote."""
-        ahead = ""
-        try:
-            result = subprocess.run(["git", "-C", path, "rev-list", "--count", "@{u}..HEAD"],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            ahead = result.stdout.decode("utf-8").replace("\n", "")
-        except subprocess.CalledProcessError:
-            return ahead
-
-        return ahead
+            pull_info["pull_returncode"] = result.returncode
+            pull_info["pull_stderr"] = result.stderr.decode("utf-8")
+            return pull_info
+        pull_info["pull_worked"] = True
+        pull_info["pull_result"] = "pulled"
+        if status.get("rev") and status["rev"] == GitInfo.get_current_rev(path):
+            pull_info["pull_result"] = "up-to-date"
+        return pull_info
 
     @classmethod
     def get_tag(cls, path: Path) -> str:
@@ -287,15 +1163,7 @@ class GitInfo:
     @classmethod
     def get_branch(cls, path: Path) -> str:
         """Return the current branch of the repo at path, or an empty str."""
-        branch = ""
-        try:
-            result = subprocess.run(["git", "-C", path, "symbolic-ref", "--short", "-q", "HEAD"],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            branch = result.stdout.decode("utf-8").replace("\n", "")
-        except subprocess.CalledProcessError:
-            return branch
-
-        return branch
+        return GitInfo.backend.get_branch(path)
 
     @classmethod
     def infer_branches(cls, path: Path) -> list:
@@ -317,183 +1185,310 @@ class GitInfo:
     @classmethod
     def get_remote_branch(cls, path: Path) -> str:
         """Return the remote of the current branch of the repo at path, or an empty str."""
-        remote_branch = ""
-        try:
-            result = subprocess.run(["git", "-C", path, "rev-parse", "--abbrev-ref", "--symbolic-full-name", "@{u}"],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            remote_branch = result.stdout.decode("utf-8").replace("\n", "")
-        except subprocess.CalledProcessError:
-            return remote_branch
-
-        return remote_branch
+        return GitInfo.backend.get_remote_branch(path)
 
     @classmethod
     def get_remote_url(cls, path: Path) -> str:
         """Return the remote url of the repo at path, or an empty str."""
-        remote_url = ""
-        try:
-            result = subprocess.run(["git", "-C", path, "config", "--get", "remote.origin.url"],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            remote_url = result.stdout.decode("utf-8").replace("\n", "")
-        except subprocess.CalledProcessError:
-            return remote_url
-
-        return remote_url
+        return GitInfo.backend.get_remote_url(path)
 
     @classmethod
     def get_remote_tags(cls, remote_url: str) -> list:
-        """Return the remote tags of the repo at path, or an empty list."""
-        remote_tags = []
-        try:
-            result = subprocess.run(["git", "-c", "versionsort.suffix=-", "ls-remote", "--tags", "--sort=-v:refname", "--refs", "--quiet", remote_url],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            result_list = result.stdout.decode("utf-8").split("\n")
-            for entry in result_list:
-                ref_and_tag = entry.split("\t")
-                if len(ref_and_tag) > 1:
-                    remote_tags.append(ref_and_tag[1].replace("refs/tags/", ""))
-        except subprocess.CalledProcessError:
-            return remote_tags
-
-        return remote_tags
+        """Return the remote tags of the repo at path sorted by descending version, or an empty list."""
+        refs = GitInfo.remote_refs.get_refs(remote_url)
+        if refs is None:
+            return []
+        tag_refs = [ref for _, ref in refs if ref.startswith("refs/tags/") and not ref.endswith("^{}")]
+        return [ref.replace("refs/tags/", "", 1) for ref in tag_refs]
 
     @classmethod
     def get_remote_branches(cls, remote_url: str) -> list:
         """Return the remote branches of the repo at path, or an empty list."""
-        remote_branches = []
-        try:
-            result = subprocess.run(["git", "ls-remote", "--heads", "--quiet", remote_url],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            result_list = result.stdout.decode("utf-8").split("\n")
-            for entry in result_list:
-                ref_and_tag = entry.split("\t")
-                if len(ref_and_tag) > 1:
-                    remote_branches.append(ref_and_tag[1].replace("refs/heads/", ""))
-        except subprocess.CalledProcessError:
-            return remote_branches
-
-        return remote_branches
+        refs = GitInfo.remote_refs.get_refs(remote_url)
+        if refs is None:
+            return []
+        return [ref.replace("refs/heads/", "", 1) for _, ref in refs if ref.startswith("refs/heads/")]
 
     @classmethod
     def get_current_rev(cls, path: Path) -> str:
         """Return the currently checked out ref of the repo at path, or an empty str."""
-        rev = ""
-        try:
-            result = subprocess.run(["git", "-C", path, "rev-parse", "HEAD"],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            rev = result.stdout.decode("utf-8").replace("\n", "")
-        except subprocess.CalledProcessError:
-            return rev
-
-        return rev
+        return GitInfo.backend.get_current_rev(path)
 
     @classmethod
-    def get_current_short_rev(cls, path: Path) -> str:
-        """Return the currently checked out short ref of the repo at path, or an empty str."""
-        rev = ""
-        try:
-            result = subprocess.run(["git", "-C", path, "rev-parse", "--short", "HEAD"],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            rev = result.stdout.decode("utf-8").replace("\n", "")
-        except subprocess.CalledProcessError:
-            return rev
+    def get_matching_refs(cls, remote: str, pattern: str) -> list:
+        """
+        Return the [rev, refname] pairs of the given remote matching pattern like git-ls-remote <remote> <pattern> does.
 
-        return rev
+        Returns None if the remote could not be listed.
+        """
+        refs = GitInfo.remote_refs.get_refs(remote)
+        if refs is None:
+            return None
+        return [[rev, ref] for rev, ref in refs if fnmatch.fnmatchcase(f"/{ref}", f"*/{pattern}")]
 
     @classmethod
     def is_tag(cls, remote: str, tag: str) -> bool:
         """Return True if the given tag can be found on the given remote."""
-        try:
-            subprocess.run(["git", "ls-remote", "--exit-code", remote, f"refs/tags/{tag}"],
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        matching_refs = GitInfo.get_matching_refs(remote, f"refs/tags/{tag}")
+        if matching_refs is None:
             return True
-        except subprocess.CalledProcessError as called_process_error:
-            if called_process_error.returncode == 2:
-                return False
-        return True
+        return len(matching_refs) > 0
 
     @classmethod
     def get_rev(cls, remote: str, branch: str) -> str:
         """Return the rev of the given branch on the given remote or the branch name on error."""
+        matching_refs = GitInfo.get_matching_refs(remote, branch)
+        if not matching_refs:
+            return branch
+        return matching_refs[0][0]
+
+    @classmethod
+    def get_remote_ref(cls, remote: str, name: str) -> Tuple[str, str]:
+        """
+        Return the full refname and the commit of the branch or tag with the given name on the given remote.
+
+        Branches take precedence over tags like they do for git clone --branch. Returns (None, None) if the remote
+        could not be listed or has no such branch or tag.
+        """
+        refs = GitInfo.remote_refs.get_refs(remote)
+        if refs is None:
+            return (None, None)
+        revs = {ref: rev for rev, ref in refs}
+        if f"refs/heads/{name}" in revs:
+            return (f"refs/heads/{name}", revs[f"refs/heads/{name}"])
+        if f"refs/tags/{name}" in revs:
+            # the peeled entry of an annotated tag contains the commit the tag points to
+            return (f"refs/tags/{name}", revs.get(f"refs/tags/{name}^{{}}", revs[f"refs/tags/{name}"]))
+        return (None, None)
+
+    @classmethod
+    def get_status(cls, path: Path) -> dict:
+        """
+        Return branch, upstream, ahead/behind, HEAD rev and dirtiness of the repo at path in one git-status call.
+
+        Untracked files are ignored, just like in is_dirty. Returns an empty dict if git-status fails.
+        """
+        status = {
+            'remote_branch': "",
+            'behind': "",
+            'ahead': "",
+            'branch': "",
+            'dirty': False,
+            'detached': False,
+            'rev': "",
+        }
         try:
-            result = subprocess.run(["git", "ls-remote", "--exit-code", remote, branch],
+            result = subprocess.run(["git", "--no-optional-locks", "-C", path, "status",
+                                     "--porcelain=v2", "--branch", "--untracked-files=no"],
                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            rev = result.stdout.decode("utf-8").replace("\n", "")
-            return rev.split()[0]
         except subprocess.CalledProcessError:
-            return branch
+            return {}
+
+        upstream = ""
+        for line in result.stdout.decode("utf-8").splitlines():
+            if not line.startswith("# "):
+                # every other line describes a changed tracked entry
+                status["dirty"] = True
+                continue
+            header = line[2:].split(" ")
+            if header[0] == "branch.oid" and header[1] != "(initial)":
+                status["rev"] = header[1]
+            elif header[0] == "branch.head":
+                if header[1] == "(detached)":
+                    status["detached"] = True
+                else:
+                    status["branch"] = header[1]
+            elif header[0] == "branch.upstream":
+                upstream = header[1]
+            elif header[0] == "branch.ab":
+                # only reported if the upstream branch actually exists
+                status["remote_branch"] = upstream
+                status["ahead"] = header[1].lstrip("+")
+                status["behind"] = header[2].lstrip("-")
+        return status
 
     @classmethod
-    def get_git_repo_info(cls, repo_path: Path, fetch=False) -> dict:
+    def get_short_rev_and_tag(cls, path: Path) -> Tuple[str, str]:
+        """
+        Return the short rev and a tag pointing to HEAD of the repo at path in one git-log call.
+
+        If several tags point to HEAD git-describe is asked which one to prefer, empty strs are returned on error.
+        """
+        try:
+            result = subprocess.run(["git", "-C", path, "log", "-1", "--format=%h%n%D", "--decorate-refs=refs/tags/"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        except subprocess.CalledProcessError:
+            return ("", "")
+        lines = result.stdout.decode("utf-8").splitlines()
+        if not lines:
+            return ("", "")
+        tags = []
+        if len(lines) > 1:
+            tags = [decoration.replace("tag: ", "", 1) for decoration in lines[1].split(", ")
+                    if decoration.startswith("tag: ")]
+        if len(tags) > 1:
+            return (lines[0], GitInfo.get_tag(path))
+        return (lines[0], tags[0] if tags else "")
+
+    @classmethod
+    def get_git_repo_info(cls, repo_path: Path, fetch=False, cache: GitInfoCache = None) -> RepoInfo:
         """
         Return useful information about a repository a the given path.
 
-        Returns a default dictionary if the path is no git repo
+        The fields of the returned RepoInfo are only queried when they are accessed.
+        If a cache is given only the dirty state is queried as long as the fingerprint of the repo is unchanged.
+        All fields are None if the path is no git repo
         """
-        repo_info = {
-            'is_repo': False,
-            'fetch_worked': None,
-            'remote_branch': None,
-            'behind': None,
-            'ahead': None,
-            'tag': None,
-            'branch': None,
-            'dirty': None,
-            'detached': None,
-            'rev': None,
-            'short_rev': None,
-            'url': None,
-        }
-        if GitInfo.is_repo(repo_path):
-            repo_info["is_repo"] = True
-            if fetch:
-                repo_info["fetch_worked"] = GitInfo.fetch(repo_path)
-            repo_info["remote_branch"] = GitInfo.get_remote_branch(repo_path)
-            repo_info["behind"] = GitInfo.get_behind(repo_path)
-            repo_info["ahead"] = GitInfo.get_ahead(repo_path)
-            repo_info["tag"] = GitInfo.get_tag(repo_path)
-            repo_info["branch"] = GitInfo.get_branch(repo_path)
-            repo_info["dirty"] = GitInfo.is_dirty(repo_path)
-            repo_info["detached"] = GitInfo.is_detached(repo_path)
-            repo_info["rev"] = GitInfo.get_current_rev(repo_path)
-            repo_info["short_rev"] = GitInfo.get_current_short_rev(repo_path)
-            repo_info["url"] = GitInfo.get_remote_url(repo_path)
+        repo_info = RepoInfo(repo_path)
+        if not repo_info.is_repo:
+            return repo_info
+        if fetch:
+            repo_info.fetch_worked = GitInfo.fetch(repo_info.path)
+        if cache is not None:
+            cached_info = cache.get(repo_info.path)
+            if cached_info is not None:
+                repo_info.set_missing(cached_info)
+                return repo_info
+            cache.put(repo_info.path, repo_info)
         return repo_info
 
     @classmethod
-    def get_git_info(cls, path: Path, fetch=False) -> dict:
+    def get_git_repos_info(cls, repo_paths: list, fetch=False, jobs: int = None,
+                           fetch_timeout: float = fetch_timeout_s,
+                           fetch_total_timeout: float = fetch_total_timeout_s, use_cache=False,
+                           fields: tuple = None) -> dict:
         """
-        Return useful information about a repository a the given path.
+        Return useful information about all repositories at the given paths.
 
-        TODO: return type should be a well defined object
-        Returns an empty dictionary if the path is no git repo
+        Up to jobs repositories are queried concurrently, the returned dictionary keeps the order of repo_paths.
+        Only the given fields, or all fields if None, of the returned RepoInfo objects are queried concurrently.
+        If fetch is requested all repositories are fetched with fetch_all first, repositories whose fetch failed
+        or timed out are reported with "fetch_worked" set to False and their remote information is stale.
+        If use_cache is set results are taken from and stored in the GitInfoCache.
         """
-        git_info = {}
-        subdirs = list(path.glob("*/"))
-        for subdir in subdirs:
-            subdir_path = Path(subdir)
-            repo_info = GitInfo.get_git_repo_info(subdir_path, fetch)
+        if not repo_paths:
+            return {}
+        fetch_results = {}
+        if fetch:
+            fetch_results = GitInfo.fetch_all([repo_path for repo_path in repo_paths
+                                               if (Path(repo_path) / ".git").is_dir()],
+                                              jobs, fetch_timeout, fetch_total_timeout)
+        cache = GitInfoCache() if use_cache else None
+
+        def load_repo_info(repo_path: Path) -> RepoInfo:
+            repo_info = GitInfo.get_git_repo_info(repo_path, False, cache)
+            repo_info.load(fields)
+            return repo_info
+
+        repo_infos = map_concurrently(load_repo_info, repo_paths, jobs)
+        if cache is not None:
+            cache.save()
+        for repo_path, repo_info in zip(repo_paths, repo_infos):
+            if repo_info["is_repo"] and repo_path in fetch_results:
+                repo_info["fetch_worked"] = fetch_results[repo_path]
+        return dict(zip(repo_paths, repo_infos))
+
+    @classmethod
+    def get_git_info(cls, path: Path, fetch=False, jobs: int = None,
+                     fetch_timeout: float = fetch_timeout_s, fetch_total_timeout: float = fetch_total_timeout_s,
+                     use_cache=False, fields: tuple = None) -> dict:
+        """
+        Return a RepoInfo for every subdirectory of the given path, sorted by path.
 
-            git_info[subdir] = repo_info
-        return git_info
+        Only the given fields, or all fields if None, are queried concurrently.
+        Returns an empty dictionary if the path has no subdirectories
+        """
+        subdirs = sorted(path.glob("*/"))
+        return GitInfo.get_git_repos_info(subdirs, fetch, jobs, fetch_timeout, fetch_total_timeout, use_cache,
+                                          fields)
 
     @classmethod
-    def pull_all(cls, path: Path, repos=None) -> dict:
-        """Pull all repositories in the given path, or a specific list of repos."""
-        git_info = {}
-        subdirs = list(path.glob("*/"))
-        for subdir in subdirs:
-            subdir_path = Path(subdir)
-            if repos is not None and len(repos) > 0 and subdir_path.name not in repos:
-                log.debug(f"Skipping {subdir_path.name} because it is not in the list of provided repos.")
+    def pull_all(cls, path: Path, repos=None, jobs: int = None) -> dict:
+        """
+        Pull all repositories in the given path, or a specific list of repos.
+
+        Up to jobs repositories are pulled concurrently, dirty repositories are skipped.
+        The returned dictionary is sorted by path and contains the pull_repo result of every repository.
+        """
+        subdirs = []
+        for subdir in sorted(path.glob("*/")):
+            if repos is not None and len(repos) > 0 and subdir.name not in repos:
+                log.debug(f"Skipping {subdir.name} because it is not in the list of provided repos.")
                 continue
-            pull_info = {'is_repo': False}
-            if GitInfo.is_repo(subdir_path):
-                pull_info["is_repo"] = True
-                pull_info["pull_worked"] = GitInfo.pull(subdir_path)
+            subdirs.append(subdir)
+
+        def pull_subdir(subdir_path: Path) -> dict:
+            if not GitInfo.is_repo(subdir_path):
+                return {'is_repo': False}
+            return GitInfo.pull_repo(subdir_path, skip_dirty=True)
+
+        if not subdirs:
+            return {}
+        pull_infos = map_concurrently(pull_subdir, subdirs, jobs)
+        return dict(zip(subdirs, pull_infos))
+
+    @classmethod
+    def is_shallow(cls, path: Path) -> bool:
+        """Check if the git repo at path has a shallow history."""
+        try:
+            result = subprocess.run(["git", "-C", path, "rev-parse", "--is-shallow-repository"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            return result.stdout.decode("utf-8").strip() == "true"
+        except subprocess.CalledProcessError:
+            return False
+
+    @classmethod
+    def has_commit(cls, path: Path, rev: str) -> bool:
+        """Check if the given rev resolves to a commit that is present in the git repo at path."""
+        try:
+            subprocess.run(["git", "-C", path, "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"],
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    @classmethod
+    def deepen_for_rev(cls, path: Path, rev: str):
+        """
+        Fetch the given rev into the shallow git repo at path if it is not present.
+
+        First only the commit of rev is fetched, if that does not make rev available the complete history
+        of all branches is fetched.
+        """
+        if not GitInfo.is_shallow(path) or GitInfo.has_commit(path, rev):
+            return
+        log.debug(f"    Fetching \"{rev}\" which is not part of the shallow history")
+        try:
+            result = subprocess.run(["git", "-C", path, "fetch", "--depth", "1", "origin", rev],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            pretty_print_process(result, 4, logging.DEBUG)
+        except subprocess.CalledProcessError as result:
+            pretty_print_process(result, 4, logging.DEBUG)
+        if GitInfo.has_commit(path, rev):
+            return
+        log.debug("    Fetching the complete history")
+        try:
+            result = subprocess.run(["git", "-C", path, "remote", "set-branches", "origin", "*"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            pretty_print_process(result, 4, logging.DEBUG)
+            result = subprocess.run(["git", "-C", path, "fetch", "--unshallow", "--tags", "origin"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            pretty_print_process(result, 4, logging.DEBUG)
+        except subprocess.CalledProcessError as result:
+            pretty_print_process(result, 4, logging.DEBUG)
 
-            git_info[subdir] = pull_info
-        return git_info
+    @classmethod
+    def set_sparse_checkout(cls, checkout_dir: Path, directories: list) -> bool:
+        """Restrict the working tree of checkout_dir to the given directories using cone mode sparse-checkout."""
+        try:
+            result = subprocess.run(["git", "-C", checkout_dir, "sparse-checkout", "set", "--cone", "--"] + directories,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            pretty_print_process(result, 4, logging.DEBUG)
+            return True
+        except subprocess.CalledProcessError as e:
+            log.warning(f"    Could not set up sparse-checkout of \"{checkout_dir.name}\":")
+            pretty_print(e.stderr.decode().strip().split("\n"), 6, logging.WARNING)
+            return False
 
     @classmethod
     def checkout_rev(cls, checkout_dir: Path, rev: str):
@@ -506,12 +1501,154 @@ class GitInfo:
             pretty_print_process(result, 4, logging.DEBUG)
 
 
+atexit.register(GitInfo.remote_refs.save)
+
+
+class DependencyGraph(collections.abc.Mapping):
+    """
+    Index of the dependencies declared in dependencies.yaml files.
+
+    Nodes are dependencies, edges lead from the repo containing a dependencies file to the dependencies declared in it.
+    Each node records the file its entry comes from and all declarations of the dependency. Like the merged dict it
+    replaces the graph maps names to entries, entries of later files in sorted path order override earlier ones.
+    Files can be set or removed individually, which only recomputes the dependencies declared in them.
+    """
+
+    def __init__(self):
+        """Initialize an empty graph."""
+        self.files = {}
+        self.nodes = {}
+        self.declaring_files = {}
+        self.order = None
+
+    def set_file(self, path: Path, repo: str, entries: dict):
+        """Set the entries declared in the dependencies file at path in the given repo."""
+        old_file = self.files.get(path)
+        if old_file is not None and old_file["repo"] == repo and old_file["entries"] == entries:
+            return
+        names = set(old_file["entries"]) if old_file is not None else set()
+        names.update(entries)
+        self.files[path] = {"repo": repo, "entries": entries}
+        for name in names:
+            if name in entries:
+                self.declaring_files.setdefault(name, set()).add(path)
+            else:
+                self.declaring_files[name].discard(path)
+            self.update_node(name)
+
+    def remove_file(self, path: Path):
+        """Remove the entries declared in the dependencies file at path."""
+        old_file = self.files.pop(path, None)
+        if old_file is None:
+            return
+        for name in old_file["entries"]:
+            self.declaring_files[name].discard(path)
+            self.update_node(name)
+
+    def remove_files_below(self, path: Path, keep: set):
+        """Remove all dependencies files below path that are not in keep."""
+        for file_path in [file_path for file_path in self.files if file_path not in keep]:
+            if path == file_path or path in file_path.parents:
+                self.remove_file(file_path)
+
+    def update_node(self, name: str):
+        """Recompute the node of the dependency with the given name from its declaring files."""
+        self.order = None
+        paths = sorted(self.declaring_files.get(name, []))
+        if not paths:
+            self.nodes.pop(name, None)
+            self.declaring_files.pop(name, None)
+            return
+        declarations = [(path, self.files[path]["repo"], self.files[path]["entries"][name]) for path in paths]
+        self.nodes[name] = {"entry": declarations[-1][2], "source": paths[-1], "declarations": declarations}
+
+    def __getitem__(self, name: str) -> dict:
+        """Return the effective config entry of the given dependency."""
+        return self.nodes[name]["entry"]
+
+    def __iter__(self):
+        """Iterate over the dependency names in the order of their first declaration."""
+        if self.order is None:
+            # the order of the first declarations, like merging the files in sorted order
+            self.order = list(dict.fromkeys(name for path in sorted(self.files)
+                                            for name in self.files[path]["entries"]))
+        return iter(self.order)
+
+    def __len__(self) -> int:
+        """Return the number of dependencies."""
+        return len(self.nodes)
+
+    def get_dependencies(self) -> dict:
+        """Return a copy of the entries of all dependencies, which can be modified without changing the graph."""
+        return {name: copy.deepcopy(self[name]) for name in self}
+
+    def get_source(self, name: str) -> Path:
+        """Return the path of the dependencies file the entry of the given dependency comes from."""
+        return self.nodes[name]["source"]
+
+    def get_declarations(self, name: str) -> list:
+        """Return (path, repo, entry) of every declaration of the given dependency in sorted path order."""
+        return list(self.nodes[name]["declarations"]) if name in self.nodes else []
+
+    def get_conflicts(self) -> dict:
+        """Return the declarations of all dependencies that are declared with different entries."""
+        conflicts = {}
+        for name in self:
+            declarations = self.nodes[name]["declarations"]
+            if any(entry != declarations[-1][2] for _, _, entry in declarations):
+                conflicts[name] = list(declarations)
+        return conflicts
+
+    def get_dependencies_of(self, repo: str) -> list:
+        """Return the names of the dependencies declared by the given repo."""
+        return [name for name in self if any(declaring_repo == repo
+                                             for _, declaring_repo, _ in self.nodes[name]["declarations"])]
+
+    def get_dependents(self, name: str, transitive=False) -> list:
+        """
+        Return the sorted names of the repos pulling in the given dependency.
+
+        If transitive is set repos pulling in these repos as dependencies are included as well.
+        """
+        dependents = set()
+        names = [name]
+        while names:
+            for _, repo, _ in self.get_declarations(names.pop()):
+                if repo not in dependents:
+                    dependents.add(repo)
+                    if transitive:
+                        names.append(repo)
+        dependents.discard(name)
+        return sorted(dependents)
+
+    def log_conflicts(self, names: list = None):
+        """Log a warning for every dependency, or every one of names, that is declared with different entries."""
+        for name, declarations in self.get_conflicts().items():
+            if names is not None and name not in names:
+                continue
+            log.warning(f"Dependency \"{name}\" is declared differently in:")
+            for path, _, entry in declarations:
+                log.warning(f"    {path}: {entry}")
+            log.warning(f"  Using the declaration in \"{self.get_source(name)}\"")
+
+
+def get_declaring_repo(path: Path, working_dir: Path) -> str:
+    """Return the name of the git repo containing the file at path, or the name of working_dir if there is none."""
+    for parent in path.parents:
+        if (parent / ".git").exists():
+            return parent.name
+        if parent == working_dir:
+            break
+    return working_dir.name
+
+
 class EDM:
     """Provide dependecy management functionality."""
 
     @classmethod
     def print_git_info(cls, git_info):
         dirty_count = 0
+        stale_count = 0
         repo_count = 0
         for path, info in git_info.items():
             if not info["is_repo"]:
@@ -539,6 +1676,9 @@ class EDM:
                         behind_ahead += f"ahead {Color.GREEN}{info['ahead']}{Color.CLEAR}"
                     if behind_ahead:
                         remote_info += f" [{behind_ahead}]"
+            if info["fetch_worked"] is False:
+                remote_info += f" [{Color.YELLOW}stale{Color.CLEAR}]"
+                stale_count += 1
             dirty = f"[{Color.GREEN}clean{Color.CLEAR}]"
             if info["dirty"]:
                 dirty = f"[{Color.RED}dirty{Color.CLEAR}]"
@@ -548,9 +1688,14 @@ class EDM:
 
         if dirty_count > 0:
             log.info(f"{dirty_count}/{repo_count} repositories are dirty.")
+        if stale_count > 0:
+            log.warning(f"{stale_count}/{repo_count} repositories could not be fetched, "
+                        "their remote information is stale.")
 
     @classmethod
-    def show_git_info(cls, working_dir: Path, workspace: str, git_fetch: bool):
+    def show_git_info(cls, working_dir: Path, workspace: str, git_fetch: bool, jobs: int = None,
+                      fetch_timeout: float = fetch_timeout_s, fetch_total_timeout: float = fetch_total_timeout_s,
+                      use_cache=False):
         """Log information about git repositories."""
         git_info_working_dir = working_dir
         if workspace:
@@ -559,12 +1704,21 @@ class EDM:
         log.info(f"Git info for \"{git_info_working_dir}\":")
         if git_fetch:
             log.info("Using git-fetch to update remote information. This might take a few seconds.")
-        git_info = GitInfo.get_git_info(git_info_working_dir, git_fetch)
+        git_info = GitInfo.get_git_info(git_info_working_dir, git_fetch, jobs, fetch_timeout, fetch_total_timeout,
+                                        use_cache)
         EDM.print_git_info(git_info)
 
     @classmethod
-    def setup_workspace_from_config(cls, workspace: str, config: str, update: bool, create_vscode_workspace: bool):
-        """Setup a workspace from the provided config, update an existing workspace if specified."""
+    def setup_workspace_from_config(cls, workspace: str, config: str, update: bool, create_vscode_workspace: bool,
+                                    jobs: int = None, clone: str = "full", mirror_cache: MirrorCache = None,
+                                    resume=False):
+        """
+        Setup a workspace from the provided config, update an existing workspace if specified.
+
+        Up to jobs dependencies are checked out concurrently using the given default clone mode.
+        If a mirror_cache is given dependencies are cloned from their mirrors, which are pruned afterwards.
+        If resume is set an interrupted setup of the workspace is continued.
+        """
         workspace_dir = Path(workspace).expanduser().resolve()
 
         config_path = Path(config).expanduser().resolve()
@@ -575,10 +1729,13 @@ class EDM:
             sys.exit(1)
         config = parse_config(config_path)
         try:
-            workspace_checkout = setup_workspace(workspace_dir, config, update)
+            workspace_checkout = setup_workspace(workspace_dir, config, update, jobs, clone, mirror_cache, resume)
         except LocalDependencyCheckoutError:
             log.error("Could not setup workspace. Stopping.")
             sys.exit(1)
+        finally:
+            if mirror_cache is not None:
+                mirror_cache.prune()
         # copy config into workspace
         try:
             config_destination_path = workspace_dir / "workspace-config.yaml"
@@ -591,17 +1748,18 @@ class EDM:
             create_vscode_workspace_file(workspace_dir, workspace_checkout)
 
     @classmethod
-    def config_from_dependencies(cls, dependencies: dict, external_in_config: bool, include_remotes: list) -> dict:
-        """Assemble a config from the given dependencies."""
+    def config_from_dependencies(cls, dependencies: DependencyGraph, external_in_config: bool,
+                                 include_remotes: list) -> dict:
+        """Assemble a config from copies of the entries of the given dependencies."""
         new_config = {}
         if external_in_config:
-            new_config = {**new_config, **dependencies}
+            new_config = dependencies.get_dependencies()
             log.debug("Including external dependencies in generated config.")
         else:
             for name, entry in dependencies.items():
                 if pattern_matches(entry["git"], include_remotes):
-                    log.debug(f"Adding \"{name}\" to config. ")
-                    new_config[name] = entry
+                    log.debug(f"Adding \"{name}\" declared in \"{dependencies.get_source(name)}\" to config. ")
+                    new_config[name] = copy.deepcopy(entry)
                 else:
                     log.debug(f"Did not add \"{name}\" to generated config because it is an external dependency.")
 
@@ -634,44 +1792,45 @@ class EDM:
                 continue
             entry["git"] = remote
             # TODO: check if there already is another config entry with this remote
-            try:
-                branch_result = subprocess.run(["git", "-C", subdir_path, "symbolic-ref", "--short", "-q", "HEAD"],
-                                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-                branch = branch_result.stdout.decode("utf-8").replace("\n", "")
+            branch = GitInfo.get_branch(subdir_path)
+            if branch:
                 log.debug(f"  branch: {branch}")
                 entry["git_tag"] = branch
-            except subprocess.CalledProcessError:
-                try:
-                    tag_result = subprocess.run(["git", "-C", subdir_path, "describe", "--exact-match", "--tags"],
-                                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-                    tag = tag_result.stdout.decode("utf-8").replace("\n", "")
-                    log.debug(f"  tag: {tag}")
-                    entry["git_tag"] = tag
-                except subprocess.CalledProcessError:
+            else:
+                tag = GitInfo.get_tag(subdir_path)
+                if not tag:
                     log.warning(f"Skipping {name} because no branch or tag could be determined.")
                     continue
+                log.debug(f"  tag: {tag}")
+                entry["git_tag"] = tag
             new_config[name] = entry
 
         return new_config
 
     @classmethod
-    def create_snapshot(cls, working_dir: Path, config_path: Path) -> dict:
-        git_info = GitInfo.get_git_info(working_dir, False)
+    def create_snapshot(cls, working_dir: Path, config_path: Path, repo_snapshots: dict = None) -> dict:
+        """
+        Return the config at config_path extended by the current rev, branch and tag of every repo in working_dir.
 
-        config = parse_config(config_path)
+        If a repo_snapshots dictionary is given it keeps this information across calls,
+        so that it is only queried again for repos whose HEAD changed.
+        """
+        if repo_snapshots is None:
+            repo_snapshots = {}
+        git_info = GitInfo.get_git_info(working_dir, False, fields=("is_repo",))
+        heads = {}
         for path, info in git_info.items():
             if not info["is_repo"]:
                 log.debug(f"{path.name} is not a repo, path: {path}")
                 continue
-            if path.name not in config:
-                config[path.name] = {}
-                config[path.name]["git"] = info["url"]
-            config[path.name]["git_rev"] = info["rev"]
-            if info["branch"] != "":
-                config[path.name]["branch"] = info["branch"]
-            else:
+            heads[path] = (GitInfo.get_current_rev(path), GitInfo.get_branch(path))
+        changed_paths = [path for path, head in heads.items()
+                         if path not in repo_snapshots or repo_snapshots[path]["head"] != head]
+        changed_info = GitInfo.get_git_repos_info(changed_paths, False, fields=("url", "rev", "branch", "tag"))
+        for path, info in changed_info.items():
+            branch = info["branch"]
+            if branch == "":
                 branches = GitInfo.infer_branches(path)
-                branch = ""
                 if "main" in branches:
                     branch = "main"
                 elif "everest" in branches:
@@ -681,9 +1840,20 @@ class EDM:
                 if len(release_branches) > 0:
                     release_branches.sort(reverse=True)
                     branch = release_branches[0]
-                config[path.name]["branch"] = branch
-            if info["tag"]:
-                config[path.name]["git_tag"] = info["tag"]
+            repo_snapshots[path] = {"head": heads[path], "url": info["url"], "rev": info["rev"], "branch": branch,
+                                    "tag": info["tag"]}
+        log.debug(f"Queried git information of {len(changed_paths)}/{len(heads)} repos for the snapshot")
+
+        config = parse_config(config_path)
+        for path in heads:
+            repo_snapshot = repo_snapshots[path]
+            if path.name not in config:
+                config[path.name] = {}
+                config[path.name]["git"] = repo_snapshot["url"]
+            config[path.name]["git_rev"] = repo_snapshot["rev"]
+            config[path.name]["branch"] = repo_snapshot["branch"]
+            if repo_snapshot["tag"]:
+                config[path.name]["git_tag"] = repo_snapshot["tag"]
         return config
 
     @classmethod
@@ -694,61 +1864,79 @@ class EDM:
             if not silent:
                 log.info(f"Adding \"{Color.GREEN}{config_entry_name}{Color.CLEAR}\" to config.")
         with open(new_config_path, 'w', encoding='utf-8') as new_config_file:
-            yaml.dump(new_config, new_config_file)
+            yaml_io.dump(new_config, new_config_file)
             if not silent:
                 log.info(f"Successfully saved config \"{new_config_path}\".")
 
     @classmethod
-    def pull(cls, working_dir: Path, repos: list):
+    def pull(cls, working_dir: Path, repos: list, jobs: int = None):
         """Pull all repos in working_dir or a restricted list of repos when provided."""
-        pull_info = GitInfo.pull_all(working_dir, repos)
-        pull_error_count = 0
+        log.info("Pulling from remotes. This might take a few seconds.")
+        pull_info = GitInfo.pull_all(working_dir, repos, jobs)
+        result_colors = {
+            "pulled": Color.GREEN,
+            "up-to-date": Color.GREEN,
+            "failed": Color.RED,
+            "skipped-dirty": Color.YELLOW,
+        }
+        result_counts = {pull_result: 0 for pull_result in result_colors}
         repo_count = 0
         for path, info in pull_info.items():
             if info["is_repo"]:
                 repo_count += 1
-                pulled = f"[{Color.GREEN}pulled{Color.CLEAR}]"
-                if not info["pull_worked"]:
-                    pulled = f"[{Color.RED}error during git-pull{Color.CLEAR}]"
-                    pull_error_count += 1
+                result_counts[info["pull_result"]] += 1
+                pulled = f"[{result_colors[info['pull_result']]}{info['pull_result']}{Color.CLEAR}]"
+                if info["pull_result"] == "failed":
+                    pulled = f"[{Color.RED}error during git-pull: {info['pull_returncode']}{Color.CLEAR}]"
 
                 log.info(f"\"{Color.GREEN}{path.name}{Color.CLEAR}\"{pulled}")
             else:
                 log.debug(f"\"{path.name}\" is not a git repository.")
-        if pull_error_count > 0:
-            log.info(f"{pull_error_count}/{repo_count} repositories could not be pulled.")
+        for path, info in pull_info.items():
+            if info["is_repo"] and info["pull_result"] == "failed":
+                log.error(f"\"{path.name}\" Error during git-pull:")
+                pretty_print(info["pull_stderr"].split("\n"), 4, logging.ERROR)
+        log.info(", ".join(f"{count} {pull_result}" for pull_result, count in result_counts.items()))
+        if result_counts["failed"] > 0:
+            log.info(f"{result_counts['failed']}/{repo_count} repositories could not be pulled.")
 
     @classmethod
-    def scan_dependencies(cls, working_dir: Path, include_deps: list, files_to_ignore: set = None) -> Tuple[dict, set]:
-        """Scan working_dir for dependencies."""
+    def scan_dependencies(cls, working_dir: Path, include_deps: list, ignore: list = None, max_depth: int = None,
+                          jobs: int = None, graph: DependencyGraph = None) -> Tuple[DependencyGraph, set]:
+        """
+        Scan working_dir for dependencies, see find_dependencies_files for ignore and max_depth.
+
+        Returns the DependencyGraph of the dependencies and the set of dependencies files.
+        The dependencies files are read and parsed by up to jobs threads, but always added in sorted order
+        so that entries of later files deterministically override those of earlier files.
+        If a graph is given it is updated with the files found below working_dir and returned.
+        """
         log.info(f"Scanning \"{working_dir}\" for dependencies.")
-        dependencies_files = set(list(working_dir.glob("**/dependencies.yaml")) +
-                                 list(working_dir.glob("**/dependencies.yml")))
-
-        if files_to_ignore:
-            dependencies_files.difference_update(files_to_ignore)
-
-        dependencies = {}
-        for dependencies_file in dependencies_files:
-            if dependencies_file.is_file():
-                # filter _deps folders
-                if not include_deps:
-                    relative_path = dependencies_file.relative_to(working_dir).parent.as_posix()
-                    if "_deps/" in relative_path:
-                        log.info(
-                            f"Ignoring dependencies in \"{dependencies_file}\" "
-                            f"because this file is located in a \"_deps\" subdirectory.")
-                        continue
-                log.info(f"Parsing dependencies file: {dependencies_file}")
-                with open(dependencies_file, encoding='utf-8') as dep:
-                    try:
-                        dependencies_yaml = yaml.safe_load(dep)
-                        if dependencies_yaml is not None:
-                            dependencies = {**dependencies, **dependencies_yaml}
-                    except yaml.YAMLError as e:
-                        log.error(f"Error parsing yaml of \"{dependencies_file}\": {e}")
+        dependencies_files = find_dependencies_files(working_dir, include_deps, ignore, max_depth)
 
-        return (dependencies, dependencies_files)
+        def load_dependencies_file(dependencies_file: Path) -> tuple:
+            try:
+                return (load_yaml_file(dependencies_file), None)
+            except yaml.YAMLError as e:
+                return (None, e)
+
+        loaded_files = map_concurrently(load_dependencies_file, dependencies_files, jobs)
+
+        if graph is None:
+            graph = DependencyGraph()
+        graph.remove_files_below(working_dir, set(dependencies_files))
+        for dependencies_file, (dependencies_yaml, error) in zip(dependencies_files, loaded_files):
+            log.info(f"Parsing dependencies file: {dependencies_file}")
+            if error is not None:
+                log.error(f"Error parsing yaml of \"{dependencies_file}\": {error}")
+                dependencies_yaml = None
+            elif dependencies_yaml is not None and not isinstance(dependencies_yaml, dict):
+                log.error(f"Ignoring \"{dependencies_file}\" because it does not contain a mapping of dependencies")
+                dependencies_yaml = None
+            graph.set_file(dependencies_file, get_declaring_repo(dependencies_file, working_dir),
+                           dependencies_yaml if dependencies_yaml is not None else {})
+
+        return (graph, set(dependencies_files))
 
     @classmethod
     def parse_workspace_files(cls, workspace_files: list) -> dict:
@@ -758,13 +1946,12 @@ class EDM:
             workspace_file = Path(workspace_files[0]).expanduser().resolve()
             if workspace_file.is_file():
                 log.info(f"Using workspace file: {workspace_file}")
-                with open(workspace_file, encoding='utf-8') as wsp:
-                    try:
-                        workspace_yaml = yaml.safe_load(wsp)
-                        if workspace_yaml is not None:
-                            workspace = {**workspace, **workspace_yaml}
-                    except yaml.YAMLError as e:
-                        log.error(f"Error parsing yaml of {workspace_file}: {e}")
+                try:
+                    workspace_yaml = load_yaml_file(workspace_file)
+                    if workspace_yaml is not None:
+                        workspace = {**workspace, **workspace_yaml}
+                except yaml.YAMLError as e:
+                    log.error(f"Error parsing yaml of {workspace_file}: {e}")
         return workspace
 
     @classmethod
@@ -812,8 +1999,18 @@ class EDM:
         return checkout
 
     @classmethod
-    def write_cmake(cls, workspace: dict, checkout: list, dependencies: dict, out_file: Path):
-        """Generate a CMake file containing the dependencies in the given out_file."""
+    def write_cmake(cls, workspace: dict, checkout: list, dependencies: dict, out_file: Path,
+                    graph: DependencyGraph = None):
+        """
+        Generate a CMake file containing the dependencies in the given out_file.
+
+        If the graph the dependencies were taken from is given, the file each dependency is declared in is noted
+        in the CMake file and dependencies that are declared differently in several files are reported.
+        """
+        sources = {}
+        if graph is not None:
+            graph.log_conflicts(list(dependencies))
+            sources = {name: graph.get_source(name) for name in dependencies if name in graph}
         templates_path = Path(__file__).parent / "templates"
         env = Environment(
             loader=FileSystemLoader(templates_path),
@@ -824,6 +2021,7 @@ class EDM:
         cpm_template = env.get_template("cpm.jinja")
         render = cpm_template.render({
             "dependencies": dependencies,
+            "sources": sources,
             "checkout": checkout,
             "workspace": workspace})
 
@@ -844,115 +2042,534 @@ class EDM:
 
         return valid
 
+    @classmethod
+    def show_dependents(cls, graph: DependencyGraph, name: str):
+        """Show the declarations of the dependency with the given name and the repos pulling it in."""
+        declarations = graph.get_declarations(name)
+        if not declarations:
+            log.info(f"\"{name}\" is not declared in any dependencies file.")
+            return
+        log.info(f"\"{Color.GREEN}{name}{Color.CLEAR}\" is declared in:")
+        for path, repo, entry in declarations:
+            log.info(f"    {path} ({repo}): {entry}")
+        log.info(f"Using the declaration in \"{graph.get_source(name)}\"")
+        direct_dependents = graph.get_dependents(name)
+        log.info(f"Pulled in directly by: {', '.join(direct_dependents)}")
+        indirect_dependents = [repo for repo in graph.get_dependents(name, True) if repo not in direct_dependents]
+        if indirect_dependents:
+            log.info(f"Pulled in indirectly by: {', '.join(indirect_dependents)}")
+
     @classmethod
     def write_config_from_scanned_dependencies(cls, working_dir: Path, include_deps: list,
                                                external_in_config: bool, include_remotes: list, config_path: Path):
         """Writes a config file from the scanned dependencies in working_dir"""
-        (dependencies, _) = EDM.scan_dependencies(working_dir, include_deps)
-        new_config = EDM.config_from_dependencies(dependencies, external_in_config, include_remotes)
+        (graph, _) = EDM.scan_dependencies(working_dir, include_deps)
+        new_config = EDM.config_from_dependencies(graph, external_in_config, include_remotes)
+        graph.log_conflicts(list(new_config))
         new_config = EDM.create_config(working_dir, new_config, external_in_config, include_remotes)
         EDM.write_config(new_config, config_path)
 
 
-def checkout_local_dependency(name: str, git: str, git_tag: str, git_rev: str, checkout_dir: Path, keep_branch=False) -> dict:
+def find_dependencies_files(working_dir: Path, include_deps=False, ignore: list = None, max_depth: int = None) -> list:
+    """
+    Return the sorted paths of all dependencies.yaml and dependencies.yml files in working_dir, walking it only once.
+
+    Directories are pruned before descending into them: .git and node_modules directories are always skipped,
+    "_deps" directories, CMake build directories and the CPM_SOURCE_CACHE unless include_deps is set.
+    Entries whose name or path relative to working_dir matches one of the ignore globs are skipped,
+    as well as directories that are more than max_depth levels below working_dir.
+    If not given ignore and max_depth default to the EVEREST_EDM_SCAN_IGNORE (comma separated globs)
+    and EVEREST_EDM_SCAN_MAX_DEPTH environment variables. Symlinks to directories are not followed.
+    """
+    if ignore is None:
+        ignore = [glob for glob in os.environ.get("EVEREST_EDM_SCAN_IGNORE", "").split(",") if glob]
+    if max_depth is None:
+        max_depth = get_env_int("EVEREST_EDM_SCAN_MAX_DEPTH")
+    cpm_source_cache = os.environ.get("CPM_SOURCE_CACHE")
+    cpm_source_cache_path = str(Path(cpm_source_cache).expanduser().resolve()) if cpm_source_cache else None
+
+    def is_ignored(name: str, relative_path: str) -> bool:
+        return any(fnmatch.fnmatch(name, glob) or fnmatch.fnmatch(relative_path, glob) for glob in ignore)
+
+    dependencies_files = []
+    dirs = [(str(working_dir), "", 0)]
+    while dirs:
+        (dir_path, relative_dir, depth) = dirs.pop()
+        try:
+            with os.scandir(dir_path) as dir_entries:
+                entries = list(dir_entries)
+        except OSError as e:
+            log.debug(f"Could not scan \"{dir_path}\": {e}")
+            continue
+        if depth > 0 and not include_deps and any(entry.name == "CMakeCache.txt" for entry in entries):
+            log.debug(f"Not scanning CMake build directory \"{dir_path}\"")
+            continue
+        for entry in entries:
+            relative_path = f"{relative_dir}{entry.name}"
+            if is_ignored(entry.name, relative_path):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in scan_pruned_dir_names or (max_depth is not None and depth >= max_depth):
+                        continue
+                    if not include_deps and (entry.name == "_deps" or entry.path == cpm_source_cache_path):
+                        log.info(f"Ignoring dependencies in \"{entry.path}\" "
+                                 "because it is part of the CPM source cache.")
+                        continue
+                    dirs.append((entry.path, f"{relative_path}/", depth + 1))
+                elif entry.name in dependencies_file_names and entry.is_file():
+                    dependencies_files.append(Path(entry.path))
+            except OSError as e:
+                log.debug(f"Could not scan \"{entry.path}\": {e}")
+
+    return sorted(dependencies_files)
+
+
+def get_sparse_directories(sparse) -> list:
+    """
+    Return the sparse-checkout directories of the sparse value of a config entry, or None for a full checkout.
+
+    sparse is either a list of directories or the name of a profile in the sparse_profiles of the edm config.
+    """
+    if not sparse:
+        return None
+    if isinstance(sparse, list):
+        return [str(directory) for directory in sparse]
+    config = load_edm_config()
+    profiles = {}
+    if config and config.get("edm") and config["edm"].get("sparse_profiles"):
+        profiles = config["edm"]["sparse_profiles"]
+    if sparse not in profiles:
+        error_message = (f"   Unknown sparse-checkout profile \"{sparse}\", "
+                         f"add it to sparse_profiles in \"{edm_config_path}\"")
+        log.warning(error_message)
+        raise LocalDependencyCheckoutError(error_message)
+    return [str(directory) for directory in profiles[sparse]]
+
+
+def update_local_dependency(name: str, git: str, git_tag: str, git_rev: str, checkout_dir: Path) -> str:
+    """
+    Update the clean repo at checkout_dir to the given git_rev or git_tag, only fetching what is needed.
+
+    The target is compared to HEAD first, using the cached remote refs for branches and tags, so that repos that
+    already are at their target are neither fetched nor checked out. Branches are fast-forwarded.
+    Returns "up-to-date", "updated", "diverged" or "failed"
+    """
+    def run_git(git_args: list) -> bool:
+        try:
+            result = subprocess.run(["git", "-C", checkout_dir] + git_args,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            pretty_print_process(result, 4, logging.DEBUG)
+            return True
+        except subprocess.CalledProcessError as e:
+            pretty_print_process(e, 4, logging.DEBUG)
+            return False
+
+    current_rev = GitInfo.get_current_rev(checkout_dir)
+    current_branch = GitInfo.get_branch(checkout_dir)
+    target = git_rev if git_rev else git_tag
+    if not target:
+        if not current_branch:
+            log.debug("    Neither git_rev nor git_tag given and HEAD is detached, nothing to update.")
+            return "up-to-date"
+        target = current_branch
+    target_ref = None
+    target_commit = None
+    if bazel._is_commit(target):
+        target_commit = target
+    elif not git_rev:
+        (target_ref, target_commit) = GitInfo.get_remote_ref(git, target)
+    is_branch = target_ref is not None and target_ref.startswith("refs/heads/")
+    if target_commit == current_rev and (not is_branch or current_branch == target):
+        log.debug(f"    Already at \"{target}\"")
+        return "up-to-date"
+
+    shallow_args = ["--depth", "1"] if GitInfo.is_shallow(checkout_dir) else []
+    # the remote branch before fetching, its history is available even in a shallow repo
+    old_remote_rev = None
+    if is_branch and GitInfo.has_commit(checkout_dir, f"refs/remotes/origin/{target}"):
+        result = subprocess.run(["git", "-C", checkout_dir, "rev-parse", f"refs/remotes/origin/{target}"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        old_remote_rev = result.stdout.decode("utf-8").strip()
+    if is_branch:
+        fetch_ok = run_git(["fetch"] + shallow_args + ["origin", f"+{target_ref}:refs/remotes/origin/{target}"])
+    elif target_ref is not None:
+        fetch_ok = run_git(["fetch"] + shallow_args + ["origin", f"+{target_ref}:{target_ref}"])
+    elif target_commit is not None and GitInfo.has_commit(checkout_dir, target_commit):
+        fetch_ok = True
+    elif target_commit is not None:
+        fetch_ok = run_git(["fetch"] + shallow_args + ["origin", target_commit])
+    else:
+        # the target could not be resolved using the remote refs, e.g. an abbreviated commit
+        fetch_ok = run_git(["fetch", "--tags", "origin"])
+    if not fetch_ok and not GitInfo.has_commit(checkout_dir, target_commit or target):
+        log.warning(f"    Could not fetch \"{target}\" of \"{name}\"")
+        return "failed"
+
+    if is_branch:
+        if current_branch != target and not run_git(["checkout", target]):
+            log.warning(f"    Could not check out branch \"{target}\" of \"{name}\"")
+            return "failed"
+        if shallow_args:
+            # the fetched commit of a shallow repo has no history to fast-forward along, so only move the branch
+            # if it has no commits that are not on the remote, before or after fetching
+            if run_git(["merge-base", "--is-ancestor", f"refs/remotes/origin/{target}", "HEAD"]):
+                log.debug(f"    Branch \"{target}\" already contains its remote")
+            elif not any(run_git(["merge-base", "--is-ancestor", "HEAD", remote_rev])
+                         for remote_rev in [old_remote_rev, f"refs/remotes/origin/{target}"] if remote_rev):
+                log.warning(f"    Branch \"{target}\" of \"{name}\" has diverged from its remote, not updating it")
+                return "diverged"
+            elif not run_git(["reset", "--keep", f"refs/remotes/origin/{target}"]):
+                log.warning(f"    Could not update branch \"{target}\" of \"{name}\"")
+                return "failed"
+        elif not run_git(["merge", "--ff-only", f"refs/remotes/origin/{target}"]):
+            log.warning(f"    Branch \"{target}\" of \"{name}\" has diverged from its remote, not updating it")
+            return "diverged"
+    elif not run_git(["checkout", "--detach", target_commit or target]):
+        log.warning(f"    Could not check out \"{target}\" of \"{name}\"")
+        return "failed"
+
+    new_rev = GitInfo.get_current_rev(checkout_dir)
+    if new_rev == current_rev:
+        return "up-to-date"
+    log.info(f"    Updated \"{Color.GREEN}{name}{Color.CLEAR}\" to \"{target}\": {current_rev[:10]} -> {new_rev[:10]}")
+    return "updated"
+
+
+def get_temporary_checkout_dir(checkout_dir: Path) -> Path:
+    """Return the temporary directory in which a new clone of checkout_dir is set up."""
+    return checkout_dir.with_name(f".{checkout_dir.name}.edm-tmp")
+
+
+def checkout_local_dependency(name: str, git: str, git_tag: str, git_rev: str, checkout_dir: Path, keep_branch=False,
+                              clone: str = "full", mirror_cache: MirrorCache = None, sparse=None,
+                              update=False) -> dict:
     """
     Clone local dependency into checkout_dir.
 
-    If the directory already exists only switch branches if the git repo is not dirty or keep_branch is False
+    clone selects one of the clone_modes, history that is missing for git_rev is fetched on demand.
+    If sparse is given only the directories it lists, or that its profile lists, are checked out.
+    If a mirror_cache is given the dependency is cloned from its mirror, origin still points to the git remote.
+    If the mirror_cache is shared the clone borrows the objects of the mirror instead of copying them.
+    New clones are set up in a temporary directory next to checkout_dir, which is renamed to checkout_dir once the
+    checkout is complete, so that an interrupted clone never looks like a valid repo.
+    If the directory already exists only switch branches if the git repo is not dirty or keep_branch is False,
+    if update is set the repo is fetched and updated using update_local_dependency instead.
+    The returned dictionary contains the result of the update in "update", or "cloned" for new clones.
     """
-    def clone_dependency_repo(git: str, git_tag: str, checkout_dir: Path) -> None:
-        """Clone given git repository at the given git_tag into checkout_dir."""
-        git_clone_args = [git, checkout_dir]
+    def clone_dependency_repo(git: str, git_tag: str, clone_dir: Path) -> None:
+        """Clone given git repository at the given git_tag into clone_dir."""
+        clone_source = git
+        mirror_path = mirror_cache.get_mirror(git) if mirror_cache is not None else None
+        if mirror_path is not None:
+            log.debug(f"  Cloning from mirror \"{mirror_path}\"")
+            clone_source = mirror_path.as_uri()
+        git_clone_args = [clone_source, clone_dir]
         if git_tag:
-            git_clone_args = ["--branch", git_tag, git, checkout_dir]
+            git_clone_args = ["--branch", git_tag, clone_source, clone_dir]
         else:
             log.debug("  No git-tag specified, cloning default branch.")
-        git_clone_cmd = ["git", "clone"] + git_clone_args
+        if mirror_path is not None and mirror_cache.shared:
+            git_clone_args = ["--reference", mirror_path] + git_clone_args
+        if sparse_directories:
+            git_clone_args = ["--sparse"] + git_clone_args
+        git_clone_cmd = ["git", "clone"] + clone_modes[clone] + git_clone_args
 
         try:
             result = subprocess.run(git_clone_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
             pretty_print_process(result, 4, logging.DEBUG)
+            if mirror_path is not None:
+                result = subprocess.run(["git", "-C", clone_dir, "remote", "set-url", "origin", git],
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                pretty_print_process(result, 4, logging.DEBUG)
+                if mirror_cache.shared:
+                    mirror_cache.add_reference(mirror_path, checkout_dir)
         except subprocess.CalledProcessError as e:
             error_message = "   Error while cloning git repository during local dependency checkout:"
             log.warning(error_message)
             pretty_print(e.stderr.decode().strip().split("\n"), 6, logging.WARNING)
             raise LocalDependencyCheckoutError(error_message) from e
+        if sparse_directories and not GitInfo.set_sparse_checkout(clone_dir, sparse_directories):
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            raise LocalDependencyCheckoutError("   Error while setting up sparse-checkout")
+
+    def fetch_dependency_commit(git: str, commit: str, clone_dir: Path) -> None:
+        """
+        Initialize a git repository in clone_dir and fetch the given commit from the given git remote first.
+
+        The branches and tags of the remote are fetched afterwards, using the filter of the clone mode,
+        so that the branch and tag of the commit can be determined later, e.g. for snapshots.
+        """
+        fetch_source = git
+        mirror_path = mirror_cache.get_mirror(git) if mirror_cache is not None else None
+        if mirror_path is not None:
+            log.debug(f"  Fetching from mirror \"{mirror_path}\"")
+            fetch_source = mirror_path.as_uri()
+        git_fetch_args = [arg for arg in clone_modes[clone] if arg != "--single-branch"]
+        try:
+            for git_cmd in [["init", "--quiet", clone_dir],
+                            ["-C", clone_dir, "remote", "add", "origin", fetch_source]]:
+                result = subprocess.run(["git"] + git_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                pretty_print_process(result, 4, logging.DEBUG)
+            if mirror_path is not None and mirror_cache.shared:
+                # borrow the objects of the mirror like git clone --reference does
+                with open(clone_dir / ".git" / "objects" / "info" / "alternates", "w", encoding="utf-8") as alternates:
+                    alternates.write(f"{(mirror_path / 'objects').as_posix()}\n")
+                mirror_cache.add_reference(mirror_path, checkout_dir)
+            if sparse_directories:
+                result = subprocess.run(["git", "-C", clone_dir, "sparse-checkout", "set", "--cone", "--"] +
+                                        sparse_directories,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                pretty_print_process(result, 4, logging.DEBUG)
+            for refspecs in [[commit], ["+refs/heads/*:refs/remotes/origin/*", "+refs/tags/*:refs/tags/*"]]:
+                result = subprocess.run(["git", "-C", clone_dir, "fetch"] + git_fetch_args + ["origin"] + refspecs,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                pretty_print_process(result, 4, logging.DEBUG)
+            if mirror_path is not None:
+                result = subprocess.run(["git", "-C", clone_dir, "remote", "set-url", "origin", git],
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                pretty_print_process(result, 4, logging.DEBUG)
+        except subprocess.CalledProcessError as e:
+            error_message = "   Error while fetching commit during local dependency checkout:"
+            log.debug(error_message)
+            pretty_print(e.stderr.decode().strip().split("\n"), 6, logging.DEBUG)
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            raise LocalDependencyCheckoutError(error_message) from e
 
     log.info(f"Setting up dependency \"{Color.GREEN}{name}{Color.CLEAR}\" in workspace")
     log.debug(f"  git-remote: \"{git}\"")
     log.debug(f"  git-tag: \"{git_tag}\"")
     log.debug(f"  git-rev: \"{git_rev}\"")
     log.debug(f"  local directory: \"{checkout_dir}\"")
+    log.debug(f"  clone mode: \"{clone}\"")
+    if clone not in clone_modes:
+        error_message = f"   Unknown clone mode \"{clone}\", available modes are: {', '.join(clone_modes)}"
+        log.warning(error_message)
+        raise LocalDependencyCheckoutError(error_message)
+    sparse_directories = get_sparse_directories(sparse)
+    if sparse_directories:
+        log.debug(f"  sparse-checkout: \"{', '.join(sparse_directories)}\"")
     git_tag_is_git_rev = False
+    work_dir = checkout_dir
+    update_result = "cloned"
     if checkout_dir.exists():
         log.debug(f"    ... the directory for dependency \"{name}\" already exists at \"{checkout_dir}\".")
+        update_result = "up-to-date"
         # check if git is dirty
         if GitInfo.is_dirty(checkout_dir):
             log.debug("    Repo is dirty, nothing will be done to this repo.")
+            update_result = "skipped-dirty"
         elif keep_branch:
             log.debug("    Keeping currently checked out branch.")
+        elif update:
+            if sparse_directories:
+                GitInfo.set_sparse_checkout(checkout_dir, sparse_directories)
+            update_result = update_local_dependency(name, git, git_tag, git_rev, checkout_dir)
+            return {"name": name, "path": checkout_dir, "git_tag": git_tag, "update": update_result}
         else:
             # if the repo is clean we can safely switch branches
+            if sparse_directories:
+                log.debug("    Repo is not dirty, applying requested sparse-checkout")
+                GitInfo.set_sparse_checkout(checkout_dir, sparse_directories)
             if git_tag is not None:
                 log.debug(f"    Repo is not dirty, checking out requested git tag \"{git_tag}\"")
+                GitInfo.deepen_for_rev(checkout_dir, git_tag)
                 GitInfo.checkout_rev(checkout_dir, git_tag)
     else:
-        try:
-            clone_dependency_repo(git, git_tag, checkout_dir)
-        except LocalDependencyCheckoutError as e:
-            # maybe the given tag was actually a rev?
+        work_dir = get_temporary_checkout_dir(checkout_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if git_tag is not None and bazel._is_commit(git_tag):
+            log.info(f"    git_tag \"{git_tag}\" is a commit id, checking out this rev.")
             if not git_rev:
-                # assume git_tag is git_rev
-                log.info(f"    No git_rev given, but git_tag \"{git_tag}\" might be a git_rev, trying to checkout this rev.")
                 git_rev = git_tag
-                git_tag = None
-                clone_dependency_repo(git, git_tag, checkout_dir)
-                git_tag_is_git_rev = True
-            elif git_rev and git_tag:
-                log.info(f"    Both git_rev and git_tag given, but git_tag \"{git_tag}\" might be a git_rev,"
-                         f" trying to checkout git_rev \"{git_rev}\" instead.")
-                git_tag = None
-                clone_dependency_repo(git, git_tag, checkout_dir)
-                git_tag_is_git_rev = True
-            else:
-                raise e
+            git_tag = None
+            git_tag_is_git_rev = True
+        if git_tag is None and git_rev is not None and bazel._is_commit(git_rev):
+            log.debug(f"    Only fetching commit \"{git_rev}\"")
+            try:
+                fetch_dependency_commit(git, git_rev, work_dir)
+            except LocalDependencyCheckoutError:
+                log.debug("    Could not fetch the commit directly, cloning the default branch instead.")
+                clone_dependency_repo(git, None, work_dir)
+        else:
+            try:
+                clone_dependency_repo(git, git_tag, work_dir)
+            except LocalDependencyCheckoutError as e:
+                # maybe the given tag was actually a rev?
+                if not git_rev:
+                    # assume git_tag is git_rev
+                    log.info(f"    No git_rev given, but git_tag \"{git_tag}\" might be a git_rev, "
+                             "trying to checkout this rev.")
+                    git_rev = git_tag
+                    git_tag = None
+                    clone_dependency_repo(git, git_tag, work_dir)
+                    git_tag_is_git_rev = True
+                elif git_rev and git_tag:
+                    log.info(f"    Both git_rev and git_tag given, but git_tag \"{git_tag}\" might be a git_rev,"
+                             f" trying to checkout git_rev \"{git_rev}\" instead.")
+                    git_tag = None
+                    clone_dependency_repo(git, git_tag, work_dir)
+                    git_tag_is_git_rev = True
+                else:
+                    raise e
 
     if git_rev is not None:
         log.debug(f"    Checking out requested git rev \"{git_rev}\"")
-        GitInfo.checkout_rev(checkout_dir, git_rev)
+        GitInfo.deepen_for_rev(work_dir, git_rev)
+        GitInfo.checkout_rev(work_dir, git_rev)
         if git_tag_is_git_rev:
             log.info(f"    Successfully checked out git_rev \"{git_rev}\" of dependency \"{Color.GREEN}{name}{Color.CLEAR}\"")
 
-    return {"name": name, "path": checkout_dir, "git_tag": git_tag}
+    if work_dir != checkout_dir:
+        os.replace(work_dir, checkout_dir)
+
+    return {"name": name, "path": checkout_dir, "git_tag": git_tag, "update": update_result}
+
+
+def get_checkout_args(name: str, entry: dict, workspace_path: Path, clone: str = "full",
+                      mirror_cache: MirrorCache = None, update=False) -> dict:
+    """Return the keyword arguments of checkout_local_dependency for the given config entry."""
+    git_tag = None
+    git_rev = None
+    sparse = None
+    if entry is not None:
+        if "git_tag" in entry:
+            git_tag = entry["git_tag"]
+        if "git_rev" in entry:
+            git_rev = entry["git_rev"]
+        if "clone" in entry:
+            clone = entry["clone"]
+        if "sparse" in entry:
+            sparse = entry["sparse"]
+    return {"name": name, "git": entry["git"], "git_tag": git_tag, "git_rev": git_rev,
+            "checkout_dir": workspace_path / name, "clone": clone, "mirror_cache": mirror_cache, "sparse": sparse,
+            "update": update}
+
+
+def checkout_local_dependencies_concurrently(checkouts: list, jobs: int = None, discover=None,
+                                             journal: SetupJournal = None) -> list:
+    """
+    Call checkout_local_dependency with the keyword arguments of every entry of checkouts, up to jobs at a time.
+
+    The log output of every checkout is buffered and emitted in one piece once the checkout finished.
+    If discover is given it is called with the result of every successful checkout as soon as it finished
+    and returns a list of further checkouts, which are started right away.
+    A failed checkout, including one raising an unexpected exception, does not stop the other ones,
+    LocalDependencyCheckoutError is raised once all of them finished.
+    If a journal is given the state of every checkout is recorded in it and checkouts that are already done
+    according to the journal are skipped, the journal is removed once all checkouts succeeded.
+    Returns the checkout results in the order of checkouts followed by the discovered checkouts
+    """
+    log_buffer = LogBuffer()
+
+    def checkout_dependency(checkout: dict) -> Tuple[dict, list]:
+        with log_buffer.capture() as records:
+            if journal is not None:
+                result = journal.get_result(checkout)
+                if result is not None:
+                    log.info(f"Dependency \"{Color.GREEN}{checkout['name']}{Color.CLEAR}\" is already set up")
+                    return (result, records)
+                journal.set_state(checkout, "in-progress")
+            try:
+                result = checkout_local_dependency(**checkout)
+            except LocalDependencyCheckoutError:
+                result = None
+            except Exception as e:
+                # e.g. an OSError while moving the clone into place, fail only this checkout
+                log.error(f"    Could not set up dependency \"{checkout['name']}\": {e!r}")
+                result = None
+            if journal is not None:
+                journal.set_state(checkout, "done" if result is not None else "failed", result)
+            return (result, records)
+
+    def submit(executor: ThreadPoolExecutor, checkout: dict):
+        if journal is not None and journal.get_result(checkout) is None:
+            journal.set_state(checkout, "planned")
+        return executor.submit(checkout_dependency, checkout)
+
+    checkouts = list(checkouts)
+    results = [None] * len(checkouts)
+    log.addFilter(log_buffer)
+    try:
+        with ThreadPoolExecutor(max_workers=get_job_count(jobs)) as executor:
+            futures = {}
+            try:
+                for index, checkout in enumerate(checkouts):
+                    futures[submit(executor, checkout)] = index
+                while futures:
+                    (done, _) = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in sorted(done, key=futures.get):
+                        index = futures.pop(future)
+                        (result, records) = future.result()
+                        LogBuffer.emit(records)
+                        results[index] = result
+                        if result is None or discover is None:
+                            continue
+                        for checkout in discover(result):
+                            futures[submit(executor, checkout)] = len(checkouts)
+                            checkouts.append(checkout)
+                            results.append(None)
+            except BaseException:
+                # do not wait for queued checkouts on errors or interrupts, only for the running ones
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        log.removeFilter(log_buffer)
+
+    failed = [checkout["name"] for checkout, result in zip(checkouts, results) if result is None]
+    if failed:
+        error_message = f"Could not set up {len(failed)}/{len(checkouts)} dependencies: {', '.join(failed)}"
+        log.error(error_message)
+        raise LocalDependencyCheckoutError(error_message)
+    if journal is not None:
+        journal.remove()
+    return results
 
 
 def parse_config(path: Path) -> dict:
     """Parse a config file in yaml format at the given path."""
     if path.is_file():
-        with open(path, encoding='utf-8') as config_file:
-            try:
-                config_yaml = yaml.safe_load(config_file)
-                if config_yaml is not None:
-                    return config_yaml
-            except yaml.YAMLError as e:
-                print(f"Error parsing yaml of {config_file}: {e}")
+        try:
+            config_yaml = load_yaml_file(path)
+            if config_yaml is not None:
+                return config_yaml
+        except yaml.YAMLError as e:
+            print(f"Error parsing yaml of {path}: {e}")
     return {}
 
 
-def setup_workspace(workspace_path: Path, config: dict, update=False) -> dict:
-    """Setup a workspace at the given workspace_path using the given config."""
+def setup_workspace(workspace_path: Path, config: dict, update=False, jobs: int = None, clone: str = "full",
+                    mirror_cache: MirrorCache = None, resume=False) -> list:
+    """
+    Setup a workspace at the given workspace_path using the given config.
+
+    Dependencies are cloned with the given clone mode unless their config entry sets its own "clone" mode.
+    If a mirror_cache is given dependencies are cloned from their mirrors.
+    If update is set existing repos that are not dirty are fetched and updated to their config entry.
+    Up to jobs dependencies are checked out concurrently, the returned checkouts keep the order of config.
+    The checkouts are recorded in a SetupJournal, if resume is set the checkouts of an interrupted setup that are
+    already done are skipped.
+    """
     log.info(f"Setting up workspace \"{workspace_path}\"")
-    workspace_checkout = []
-    for name, entry in config.items():
-        checkout_dir = workspace_path / name
-        git_tag = None
-        git_rev = None
-        if entry is not None:
-            if "git_tag" in entry:
-                git_tag = entry["git_tag"]
-            if "git_rev" in entry:
-                git_rev = entry["git_rev"]
-        workspace_checkout.append(checkout_local_dependency(name, entry["git"], git_tag, git_rev, checkout_dir))
+    if update:
+        # branches and tags have to be compared to their current state on the remotes
+        GitInfo.remote_refs.refresh = True
+    checkouts = [get_checkout_args(name, entry, workspace_path, clone, mirror_cache, update)
+                 for name, entry in config.items()]
+    journal = SetupJournal(workspace_path, resume)
+    workspace_checkout = checkout_local_dependencies_concurrently(checkouts, jobs, journal=journal)
+    if update:
+        update_counts = {}
+        for checkout in workspace_checkout:
+            update_result = checkout.get("update", "up-to-date")
+            update_counts[update_result] = update_counts.get(update_result, 0) + 1
+        reasons = {"skipped-dirty": "they have uncommitted changes", "diverged": "their branches have diverged"}
+        for update_result, reason in reasons.items():
+            names = [checkout["name"] for checkout in workspace_checkout if checkout.get("update") == update_result]
+            if names:
+                log.warning(f"Not updated because {reason}: {', '.join(names)}")
+        log.info(", ".join(f"{count} {update_result}" for update_result, count in update_counts.items()))
 
     log.info("Done.")
     return workspace_checkout
@@ -987,11 +2604,10 @@ def load_edm_config():
     if edm_config_path.exists():
         # load config if exists
         log.debug(f"Loading edm config from {edm_config_path}")
-        with open(edm_config_path, encoding='utf-8') as edm_config_file:
-            try:
-                config = yaml.safe_load(edm_config_file)
-            except yaml.YAMLError as e:
-                log.error(f"Error parsing yaml of \"{edm_config_path}\": {e}")
+        try:
+            config = load_yaml_file(edm_config_path)
+        except yaml.YAMLError as e:
+            log.error(f"Error parsing yaml of \"{edm_config_path}\": {e}")
     return config
 
 
@@ -1020,6 +2636,7 @@ def init_handler(args):
         log.info("No release specified, checking for most recent stable version...")
 
     github_key_available = EDM.check_github_key()
+    mirror_cache = MirrorCache.from_environment(args.mirror_cache, args.shared_objects)
 
     github_https_pefix = "https://github.com/EVerest/"
     github_git_prefix = "git@github.com:EVerest/"
@@ -1035,6 +2652,7 @@ def init_handler(args):
                                "repo": github_prefix + "everest-dev-environment.git", "release": None}
     everest_utils = {"name": "everest-utils", "repo": github_prefix + "everest-utils.git", "release": None}
 
+    config = {}
     for repo in [everest_core, everest_cmake, everest_dev_environment, everest_utils]:
         tags = GitInfo.get_remote_tags(repo["repo"])
         latest_tag = tags[0] if len(tags) > 0 else "main"
@@ -1053,44 +2671,41 @@ def init_handler(args):
                     sys.exit(1)
 
         log.info(f"Using \"{Color.GREEN}{repo['name']}{Color.CLEAR}\" @ {latest_tag}")
-        checkout_local_dependency(repo["name"], repo["repo"], latest_tag, None, working_dir / repo["name"], False)
-
-    # now we have the basics, get the rest recursively
-    iterations = 10
-    old_snapshot = {}
-    config = {}
-    scanned_dependencies_files = set()
-    for i in range(iterations):
-        if i > 0:
-            # only do recursive parsing if explicitly requested
-            (dependencies, dependencies_files) = EDM.scan_dependencies(
-                working_dir, args.include_deps, scanned_dependencies_files)
-            scanned_dependencies_files.update(dependencies_files)
-            new_config = EDM.config_from_dependencies(dependencies, args.external_in_config, args.include_remotes)
-            new_config = EDM.create_config(working_dir, new_config, args.external_in_config, args.include_remotes)
-            # merge config with new_config, overwrite github https prefix with git prefix
-            for name, entry in new_config.items():
-                if name not in config:
-                    if github_key_available and "git" in entry and entry["git"].startswith(github_https_pefix):
-                        entry["git"] = entry["git"].replace(github_https_pefix, github_git_prefix, 1)
-                    config[name] = entry
-                    checkout_dir = working_dir / name
-                    git_tag = None
-                    git_rev = None
-                    if entry is not None:
-                        if "git_tag" in entry:
-                            git_tag = entry["git_tag"]
-                        if "git_rev" in entry:
-                            git_rev = entry["git_rev"]
-                    checkout_local_dependency(name, entry["git"], git_tag, git_rev, checkout_dir)
-            EDM.write_config(config, config_path, True)
-            # EDM.setup_workspace_from_config(working_dir, config_path, False, False)
-
-        snapshot = EDM.create_snapshot(working_dir, config_path)
-        if snapshot == old_snapshot:
-            log.info(f'Stopping recursive workspace setup early after {i+1} loops.')
-            break
-        old_snapshot = snapshot
+        config[repo["name"]] = {"git": repo["repo"], "git_tag": latest_tag}
+
+    # dependencies declared by all repos checked out so far
+    graph = DependencyGraph()
+
+    def discover_dependencies(checkout: dict) -> list:
+        """Return the checkouts of the dependencies of a checked out repo that are not in the config yet."""
+        EDM.scan_dependencies(checkout["path"], args.include_deps, graph=graph)
+        new_config = EDM.config_from_dependencies(graph, args.external_in_config, args.include_remotes)
+        new_checkouts = []
+        for name, entry in new_config.items():
+            if name in config:
+                continue
+            # overwrite github https prefix with git prefix
+            if github_key_available and "git" in entry and entry["git"].startswith(github_https_pefix):
+                entry["git"] = entry["git"].replace(github_https_pefix, github_git_prefix, 1)
+            config[name] = entry
+            new_checkouts.append(get_checkout_args(name, entry, working_dir, args.clone, mirror_cache))
+        return new_checkouts
+
+    # check out the basics, every repo is scanned for further dependencies as soon as it is checked out
+    checkouts = [get_checkout_args(name, entry, working_dir, args.clone, mirror_cache)
+                 for name, entry in config.items()]
+    try:
+        checkout_local_dependencies_concurrently(checkouts, args.jobs, discover_dependencies,
+                                                 SetupJournal(working_dir, args.resume))
+    except LocalDependencyCheckoutError:
+        log.error("Could not setup workspace. Stopping.")
+        sys.exit(1)
+    finally:
+        if mirror_cache is not None:
+            mirror_cache.prune()
+    graph.log_conflicts(list(config))
+    config = EDM.create_config(working_dir, config, args.external_in_config, args.include_remotes)
+    EDM.write_config(config, config_path, True)
     EDM.show_git_info(working_dir, None, False)
 
     # write config file
@@ -1108,7 +2723,7 @@ def init_handler(args):
         config["edm"]["active_workspace"] = workspace_name
         config["workspaces"][workspace_name] = {}
         config["workspaces"][workspace_name]["path"] = working_dir.as_posix()
-        yaml.dump(config, edm_config_file)
+        yaml_io.dump(config, edm_config_file)
         log.info(f"Successfully saved edm config \"{edm_config_path}\".")
 
 
@@ -1142,24 +2757,71 @@ def rm_handler(args):
         # write config
         with open(edm_config_path, 'w', encoding='utf-8') as edm_config_file:
             config["edm"]["active_workspace"] = None
-            yaml.dump(config, edm_config_file)
+            yaml_io.dump(config, edm_config_file)
             log.info(f"Successfully saved edm config \"{edm_config_path}\".")
 
 
+def cache_list_handler(args):
+    """Handler for the edm cache list subcommand"""
+    mirror_cache = MirrorCache.from_environment(True)
+    mirrors = mirror_cache.get_mirrors()
+    if not mirrors:
+        log.info(f"Mirror cache \"{mirror_cache.path}\" is empty")
+        return
+    log.info(f"Mirrors in \"{mirror_cache.path}\", most recently used first:")
+    for mirror in mirrors:
+        last_used = datetime.datetime.fromtimestamp(mirror["last_used"]).strftime("%Y-%m-%d %H:%M")
+        used_by = f", used by {len(mirror['references'])} clones" if mirror["references"] else ""
+        log.info(f"  {Color.GREEN}{mirror['url']}{Color.CLEAR} ({format_size(mirror['size'])}, "
+                 f"last used {last_used}{used_by})")
+    log.info(f"{len(mirrors)} mirrors using {format_size(sum(mirror['size'] for mirror in mirrors))}")
+
+
+def cache_prune_handler(args):
+    """Handler for the edm cache prune subcommand"""
+    mirror_cache = MirrorCache.from_environment(True)
+    removed = mirror_cache.prune(args.max_size, args.max_age, args.all)
+    for mirror in removed:
+        log.info(f"  Removed mirror of {Color.GREEN}{mirror['url']}{Color.CLEAR} ({format_size(mirror['size'])})")
+    log.info(f"Removed {len(removed)} mirrors freeing {format_size(sum(mirror['size'] for mirror in removed))}")
+    referenced_count = len([mirror for mirror in mirror_cache.get_mirrors() if mirror["references"]])
+    if referenced_count > 0:
+        log.info(f"{referenced_count} mirrors are kept because clones borrow their objects, "
+                 "use \"edm cache dissociate\" in their workspaces to make them standalone.")
+
+
+def cache_dissociate_handler(args):
+    """Handler for the edm cache dissociate subcommand"""
+    working_dir = Path(args.working_dir).expanduser().resolve()
+
+    if not args.repo_name:
+        log.info("No repo name specified, dissociating every repo in the current workspace")
+        repo_paths = sorted(path for path in working_dir.glob("*/") if (path / ".git").is_dir())
+    else:
+        repo_paths = [working_dir / repo_name for repo_name in args.repo_name]
+    dissociated = 0
+    for repo_path in repo_paths:
+        if MirrorCache.dissociate(repo_path):
+            log.info(f"\"{Color.GREEN}{repo_path.name}{Color.CLEAR}\" is now standalone")
+            dissociated += 1
+        else:
+            log.debug(f"\"{repo_path.name}\" does not borrow objects")
+    log.info(f"Dissociated {dissociated}/{len(repo_paths)} repositories from the shared object store")
+
+
 def git_info_handler(args):
     """Handler for the edm git info subcommand"""
     working_dir = Path(args.working_dir).expanduser().resolve()
 
     if not args.repo_name:
         log.info("No repo name specified, listing git info for every repo in the current workspace")
-        EDM.show_git_info(working_dir, None, True)
+        EDM.show_git_info(working_dir, None, True, args.jobs, args.fetch_timeout, args.fetch_total_timeout,
+                          not args.no_cache)
     else:
         log.info(f"Only listing git info for {', '.join(args.repo_name)}")
-        git_info = {}
-        for repo_name in args.repo_name:
-            repo_path = working_dir / repo_name
-            repo_info = GitInfo.get_git_repo_info(repo_path, True)
-            git_info[repo_path] = repo_info
+        repo_paths = [working_dir / repo_name for repo_name in args.repo_name]
+        git_info = GitInfo.get_git_repos_info(repo_paths, True, args.jobs, args.fetch_timeout, args.fetch_total_timeout,
+                                              not args.no_cache)
         EDM.print_git_info(git_info)
     sys.exit(0)
 
@@ -1170,9 +2832,9 @@ def git_pull_handler(args):
 
     if not args.repo_name:
         log.info("No repo name specified, pulling all repos in the current workspace")
-        EDM.pull(working_dir, repos=None)
+        EDM.pull(working_dir, repos=None, jobs=args.jobs)
     else:
-        EDM.pull(working_dir, repos=args.repo_name)
+        EDM.pull(working_dir, repos=args.repo_name, jobs=args.jobs)
 
 
 def snapshot_handler(args):
@@ -1192,18 +2854,29 @@ def snapshot_handler(args):
     if args.recursive:
         iterations = args.recursive
     old_snapshot = {}
+    repo_snapshots = {}
+    set_up_config = {}
     for i in range(iterations):
         if i > 0:
             # only do recursive parsing if explicitly requested
             EDM.write_config_from_scanned_dependencies(
                 working_dir, args.include_deps, args.external_in_config, args.include_remotes, config_path)
-            EDM.setup_workspace_from_config(working_dir, config_path, False, False)
-        snapshot = EDM.create_snapshot(working_dir, config_path)
-        EDM.write_config(snapshot, args.snapshot_name)
+            # only set up the config entries that were added or changed since the last iteration
+            config = parse_config(config_path)
+            new_config = {name: entry for name, entry in config.items() if set_up_config.get(name) != entry}
+            if new_config:
+                try:
+                    setup_workspace(working_dir, new_config)
+                except LocalDependencyCheckoutError:
+                    log.error("Could not setup workspace. Stopping.")
+                    sys.exit(1)
+            set_up_config = config
+        snapshot = EDM.create_snapshot(working_dir, config_path, repo_snapshots)
         if snapshot == old_snapshot:
             log.info(f'Stopping recursive snapshot generation early after {i+1} loops.')
             break
         old_snapshot = snapshot
+    EDM.write_config(snapshot, args.snapshot_name)
     sys.exit(0)
 
 
@@ -1231,6 +2904,12 @@ def check_non_local_dependecy(dependency_item):
 
 
 def check_origin_of_dependencies(dependencies, checkout):
+    """
+    Replace the git_tag of non-local dependencies by the remote rev if it is not a tag.
+
+    Every distinct remote is listed only once by up to get_job_count() concurrent threads,
+    tags, branches and revs are then classified locally in the order of the dependencies.
+    """
     non_local_dependencies = {}
 
     # handle locally available dependencies and filter out non-local ones
@@ -1249,10 +2928,23 @@ def check_origin_of_dependencies(dependencies, checkout):
         # fall-through
         non_local_dependencies[name] = dependency
 
-    with multiprocessing.Pool() as pool:
-        modified_dependencies = pool.map(check_non_local_dependecy, non_local_dependencies.items())
-        for name, dependency in modified_dependencies:
-            dependencies[name] = dependency
+    remote_urls = sorted({dependency["git"] for dependency in non_local_dependencies.values()
+                          if dependency.get("git") and dependency.get("git_tag")})
+    uncached_remote_urls = [remote_url for remote_url in remote_urls
+                            if GitInfo.remote_refs.get_cached_refs(remote_url) is None]
+    if uncached_remote_urls:
+        log.info(f"Listing refs of {len(uncached_remote_urls)} remote(s)")
+        remote_refs = map_concurrently(RemoteRefsCache.list_refs, uncached_remote_urls)
+        for remote_url, refs in zip(uncached_remote_urls, remote_refs):
+            if refs is None:
+                log.warning(f"Could not list refs of \"{remote_url}\"")
+            else:
+                log.debug(f"Listed {len(refs)} refs of \"{remote_url}\"")
+            GitInfo.remote_refs.set_refs(remote_url, refs)
+
+    for dependency_item in non_local_dependencies.items():
+        (name, dependency) = check_non_local_dependecy(dependency_item)
+        dependencies[name] = dependency
 
 
 def modify_dependencies_yaml(dependencies, modified_dependencies_yaml):
@@ -1289,13 +2981,12 @@ def modify_dependencies_yaml(dependencies, modified_dependencies_yaml):
 
 def modify_dependencies(dependencies, modify_dependencies_file):
     log.info(f'Modifying dependencies with file: {modify_dependencies_file}')
-    with open(modify_dependencies_file, encoding='utf-8') as modified_dependencies_file:
-        try:
-            modified_dependencies_yaml = yaml.safe_load(modified_dependencies_file)
-            if modified_dependencies_yaml:
-                modify_dependencies_yaml(dependencies, modified_dependencies_yaml)
-        except yaml.YAMLError as e:
-            log.error(f"Error parsing yaml of {modify_dependencies_file}: {e}")
+    try:
+        modified_dependencies_yaml = load_yaml_file(Path(modify_dependencies_file))
+        if modified_dependencies_yaml:
+            modify_dependencies_yaml(dependencies, modified_dependencies_yaml)
+    except yaml.YAMLError as e:
+        log.error(f"Error parsing yaml of {modify_dependencies_file}: {e}")
 
 
 def modify_dependencies_urls(dependencies, modify_dependencies_input):
@@ -1355,7 +3046,7 @@ def release_handler(args):
     if metadata_path.exists():
         log.info(f"Using metadata file: {metadata_path}")
         with open(metadata_path, encoding='utf-8') as metadata_file:
-            metadata_yaml_data = yaml.safe_load(metadata_file)
+            metadata_yaml_data = yaml_io.safe_load(metadata_file)
             if metadata_yaml_data:
                 metadata_yaml = metadata_yaml_data
 
@@ -1461,7 +3152,8 @@ def main_handler(args):
         EDM.show_git_info(working_dir, args.workspace, args.git_fetch)
         sys.exit(0)
 
-    if not args.config and not args.cmake and not args.create_config and not args.create_snapshot:
+    if (not args.config and not args.cmake and not args.create_config and not args.create_snapshot and
+            not args.dependents):
         log.info("No --config, --cmake or --create-config parameter given, exiting.")
         sys.exit(0)
 
@@ -1470,7 +3162,9 @@ def main_handler(args):
             log.error("A workspace path must be provided if supplying a config. Stopping.")
             sys.exit(1)
 
-        EDM.setup_workspace_from_config(args.workspace, args.config, False, args.create_vscode_workspace)
+        mirror_cache = MirrorCache.from_environment(args.mirror_cache, args.shared_objects)
+        EDM.setup_workspace_from_config(args.workspace, args.config, args.update, args.create_vscode_workspace,
+                                        args.jobs, args.clone, mirror_cache, args.resume)
         sys.exit(0)
 
     if args.create_snapshot:
@@ -1479,17 +3173,23 @@ def main_handler(args):
         EDM.write_config(snapshot, args.create_snapshot)
         sys.exit(0)
 
-    if not args.cmake and not args.create_config:
+    if not args.cmake and not args.create_config and not args.dependents:
         log.error("FIXME")
         sys.exit(1)
 
     out_file = Path(args.out).expanduser().resolve()
 
-    (dependencies, _) = EDM.scan_dependencies(working_dir, args.include_deps)
+    (graph, _) = EDM.scan_dependencies(working_dir, args.include_deps,
+                                       ignore=args.scan_ignore, max_depth=args.scan_max_depth, jobs=args.jobs)
+
+    if args.dependents:
+        EDM.show_dependents(graph, args.dependents)
+        sys.exit(0)
 
     if args.create_config:
         log.info("Creating config")
-        new_config = EDM.config_from_dependencies(dependencies, args.external_in_config, args.include_remotes)
+        new_config = EDM.config_from_dependencies(graph, args.external_in_config, args.include_remotes)
+        graph.log_conflicts(list(new_config))
         new_config = EDM.create_config(working_dir, new_config, args.external_in_config, args.include_remotes)
         EDM.write_config(new_config, args.create_config)
         sys.exit(0)
@@ -1507,6 +3207,8 @@ def main_handler(args):
     else:
         log.info(f'Using parent directory as workspace path: {workspace_dir}')
 
+    # the dependencies are modified below, the graph keeps the declared entries
+    dependencies = graph.get_dependencies()
     workspace = EDM.parse_workspace_directory(workspace_dir)
     checkout = EDM.checkout_local_dependencies(workspace, args.workspace, dependencies)
 
@@ -1526,7 +3228,7 @@ def main_handler(args):
 
     check_origin_of_dependencies(dependencies, checkout)
 
-    EDM.write_cmake(workspace, checkout, dependencies, out_file)
+    EDM.write_cmake(workspace, checkout, dependencies, out_file, graph)
 
 
 def get_parser(version) -> argparse.ArgumentParser:
@@ -1547,6 +3249,14 @@ def get_parser(version) -> argparse.ArgumentParser:
         help="Include dependency files that are stored in \"_deps\" directories. "
              "Given that files in these directories are part of the in-tree source cache of CPM "
              "you probably almost never want to do this.")
+    parser.add_argument(
+        "--scan-ignore", action="append", metavar="GLOB",
+        help="Do not scan directories or files matching this glob for dependencies, can be given multiple times. "
+             "Defaults to the comma separated globs of the EVEREST_EDM_SCAN_IGNORE environment variable.")
+    parser.add_argument(
+        "--scan-max-depth", type=int, metavar="DEPTH",
+        help="Only scan this many directory levels for dependencies. "
+             "Defaults to the EVEREST_EDM_SCAN_MAX_DEPTH environment variable or no limit.")
     parser.add_argument(
         "--config", metavar='CONFIG',
         help="Path to a config file that contains the repositories that should be checked out into the workspace.",
@@ -1585,12 +3295,46 @@ def get_parser(version) -> argparse.ArgumentParser:
         nargs="?",
         const="snapshot.yaml",
         required=False)
+    parser.add_argument(
+        "--refresh-remotes", action="store_true",
+        help="List the branches and tags of remotes again instead of using the cached listings.")
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        help="Number of repositories that are cloned concurrently, default is the number of CPUs.",
+        required=False)
+    parser.add_argument(
+        "--mirror-cache", action="store_true",
+        help=f"Clone repositories from bare mirrors kept in \"{mirror_cache_dir_path}\", or in the directory set\n"
+             "by the EVEREST_EDM_MIRROR_CACHE environment variable which also enables the mirrors.")
+    parser.add_argument(
+        "--update", action="store_true",
+        help="Fetch and update the repositories of an existing workspace whose config entry changed.\n"
+             "Repositories with uncommitted changes are skipped.")
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue an interrupted workspace setup, skipping the repositories that were already set up.")
+    parser.add_argument(
+        "--shared-objects", action="store_true",
+        help="Let the cloned repositories borrow the objects of the mirror cache instead of copying them.\n"
+             "Use \"edm cache dissociate\" to make a workspace standalone again.")
+    parser.add_argument(
+        "--clone",
+        choices=list(clone_modes),
+        default="full",
+        help="How repositories are cloned unless their config entry sets a \"clone\" mode, default is full:\n"
+             "shallow only clones the most recent commit, blobless and treeless download file contents and\n"
+             "directories on demand.",
+        required=False)
     parser.add_argument(
         "--git-info", action="store_true",
         help="Show information of git repositories in working_dir")
     parser.add_argument(
         "--git-fetch", action="store_true",
         help="Use git-fetch to get updated info from remote")
+    parser.add_argument(
+        "--dependents", metavar="DEPENDENCY",
+        help="Show which repositories in working_dir pull in the given dependency, directly or transitively")
     parser.add_argument(
         "--git-pull",
         help="Use git-pull to pull all git repositories in working_dir",
@@ -1620,6 +3364,29 @@ def get_parser(version) -> argparse.ArgumentParser:
         "--list",
         action="store_true",
         help="List available everest-core versions.")
+    init_parser.add_argument(
+        "--refresh-remotes", action="store_true", default=argparse.SUPPRESS,
+        help="List the branches and tags of remotes again instead of using the cached listings.")
+    init_parser.add_argument(
+        "--jobs", "-j",
+        type=int, default=argparse.SUPPRESS,
+        help="Number of repositories that are cloned concurrently, default is the number of CPUs.")
+    init_parser.add_argument(
+        "--clone",
+        choices=list(clone_modes), default=argparse.SUPPRESS,
+        help="How repositories are cloned unless their config entry sets a \"clone\" mode, default is full.")
+    init_parser.add_argument(
+        "--mirror-cache", action="store_true", default=argparse.SUPPRESS,
+        help="Clone repositories from bare mirrors, see edm --help.")
+    init_parser.add_argument(
+        "--update", action="store_true", default=argparse.SUPPRESS,
+        help="Fetch and update the repositories of an existing workspace when using --config.")
+    init_parser.add_argument(
+        "--resume", action="store_true", default=argparse.SUPPRESS,
+        help="Continue an interrupted workspace setup, skipping the repositories that were already set up.")
+    init_parser.add_argument(
+        "--shared-objects", action="store_true", default=argparse.SUPPRESS,
+        help="Let the cloned repositories borrow the objects of the mirror cache, see edm --help.")
 
     list_parser = subparsers.add_parser('list', add_help=True)
     list_parser.set_defaults(action_handler=list_handler)
@@ -1631,6 +3398,38 @@ def get_parser(version) -> argparse.ArgumentParser:
         help="Name of the workspace to remove",
         nargs=1)
 
+    cache_parser = subparsers.add_parser('cache', add_help=True)
+    cache_parser.set_defaults(action_handler=cache_list_handler)
+    cache_subparsers = cache_parser.add_subparsers(help='available cache commands')
+
+    cache_list_parser = cache_subparsers.add_parser('list', add_help=True)
+    cache_list_parser.set_defaults(action_handler=cache_list_handler)
+
+    cache_prune_parser = cache_subparsers.add_parser('prune', add_help=True)
+    cache_prune_parser.add_argument(
+        "--max-size",
+        type=parse_size,
+        help="Remove the least recently used mirrors until they use at most this size, for example 20G.\n"
+             "Defaults to the EVEREST_EDM_MIRROR_CACHE_MAX_SIZE environment variable.",
+        required=False)
+    cache_prune_parser.add_argument(
+        "--max-age",
+        type=float,
+        help="Remove mirrors that were not used for this number of days.\n"
+             "Defaults to the EVEREST_EDM_MIRROR_CACHE_MAX_AGE environment variable.",
+        required=False)
+    cache_prune_parser.add_argument(
+        "--all", action="store_true",
+        help="Remove all mirrors.")
+    cache_prune_parser.set_defaults(action_handler=cache_prune_handler)
+
+    cache_dissociate_parser = cache_subparsers.add_parser('dissociate', add_help=True)
+    cache_dissociate_parser.add_argument(
+        "repo_name",
+        help="Name of the repo(s) that should get a copy of the objects they borrow from the mirror cache",
+        nargs="*")
+    cache_dissociate_parser.set_defaults(action_handler=cache_dissociate_handler)
+
     git_parser = subparsers.add_parser('git', add_help=True)
     git_subparsers = git_parser.add_subparsers(help='available git commands')
 
@@ -1639,6 +3438,26 @@ def get_parser(version) -> argparse.ArgumentParser:
         "repo_name",
         help="Name of the repo(s) to get info from",
         nargs="*")
+    git_info_parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        help="Number of repositories that are queried concurrently, default is the number of CPUs.",
+        required=False)
+    git_info_parser.add_argument(
+        "--fetch-timeout",
+        type=float,
+        default=fetch_timeout_s,
+        help=f"Seconds after which the git-fetch of a single repository is aborted, default is {fetch_timeout_s}.",
+        required=False)
+    git_info_parser.add_argument(
+        "--fetch-total-timeout",
+        type=float,
+        default=fetch_total_timeout_s,
+        help=f"Seconds after which all remaining git-fetch calls are aborted, default is {fetch_total_timeout_s}.",
+        required=False)
+    git_info_parser.add_argument(
+        "--no-cache", action="store_true",
+        help=f"Query every repository instead of using the git info cache stored in \"{git_info_cache_path}\".")
     git_info_parser.set_defaults(action_handler=git_info_handler)
 
     git_pull_parser = git_subparsers.add_parser('pull', add_help=True)
@@ -1646,6 +3465,11 @@ def get_parser(version) -> argparse.ArgumentParser:
         "repo_name",
         help="Name of the repo(s) to pull",
         nargs="*")
+    git_pull_parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        help="Number of repositories that are pulled concurrently, default is the number of CPUs.",
+        required=False)
     git_pull_parser.set_defaults(action_handler=git_pull_handler)
 
     snapshot_parser = subparsers.add_parser('snapshot', add_help=True)
@@ -1659,6 +3483,7 @@ def get_parser(version) -> argparse.ArgumentParser:
         "--recursive",
         help="Recursively check out the snapshot",
         nargs="?",
+        type=int,
         const=10,
         required=False)
     snapshot_parser.add_argument(
@@ -1732,6 +3557,9 @@ def main(parser: argparse.ArgumentParser):
 
     setup_logging(args.verbose, args.nocolor)
 
+    if args.refresh_remotes:
+        GitInfo.remote_refs.refresh = True
+
     if not os.environ.get("CPM_SOURCE_CACHE"):
         log.warning("CPM_SOURCE_CACHE environment variable is not set, this might lead to unintended behavior.")
 
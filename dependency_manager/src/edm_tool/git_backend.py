@@ -0,0 +1,409 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+# Copyright Pionix GmbH and Contributors to EVerest
+#
+"""Backends answering read-only ref queries about git repositories for edm_tool."""
+import abc
+import logging
+import os
+import subprocess
+from pathlib import Path
+
+
+log = logging.getLogger("edm")
+
+
+class GitBackendUnsupported(Exception):
+    """Exception thrown when a backend cannot answer a query and another backend should be asked."""
+
+
+class GitBackend(abc.ABC):
+    """Interface for read-only ref queries about the git repository at a given path."""
+
+    @abc.abstractmethod
+    def get_branch(self, path: Path) -> str:
+        """Return the current branch of the repo at path, or an empty str."""
+
+    @abc.abstractmethod
+    def get_current_rev(self, path: Path) -> str:
+        """Return the currently checked out ref of the repo at path, or an empty str."""
+
+    @abc.abstractmethod
+    def is_detached(self, path: Path) -> bool:
+        """Check if the git repo at path is in detached HEAD state."""
+
+    @abc.abstractmethod
+    def get_remote_url(self, path: Path) -> str:
+        """Return the remote url of the repo at path, or an empty str."""
+
+    @abc.abstractmethod
+    def get_remote_branch(self, path: Path) -> str:
+        """Return the remote of the current branch of the repo at path, or an empty str."""
+
+
+class SubprocessGitBackend(GitBackend):
+    """Answer every query by running git."""
+
+    def get_branch(self, path: Path) -> str:
+        """Return the current branch of the repo at path, or an empty str."""
+        branch = ""
+        try:
+            result = subprocess.run(["git", "-C", path, "symbolic-ref", "--short", "-q", "HEAD"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            branch = result.stdout.decode("utf-8").replace("\n", "")
+        except subprocess.CalledProcessError:
+            return branch
+
+        return branch
+
+    def get_current_rev(self, path: Path) -> str:
+        """Return the currently checked out ref of the repo at path, or an empty str."""
+        rev = ""
+        try:
+            result = subprocess.run(["git", "-C", path, "rev-parse", "HEAD"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            rev = result.stdout.decode("utf-8").replace("\n", "")
+        except subprocess.CalledProcessError:
+            return rev
+
+        return rev
+
+    def is_detached(self, path: Path) -> bool:
+        """Check if the git repo at path is in detached HEAD state."""
+        try:
+            subprocess.run(["git", "-C", path, "symbolic-ref", "-q", "HEAD"],
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            return False
+        except subprocess.CalledProcessError:
+            return True
+
+    def get_remote_url(self, path: Path) -> str:
+        """Return the remote url of the repo at path, or an empty str."""
+        remote_url = ""
+        try:
+            result = subprocess.run(["git", "-C", path, "config", "--get", "remote.origin.url"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            remote_url = result.stdout.decode("utf-8").replace("\n", "")
+        except subprocess.CalledProcessError:
+            return remote_url
+
+        return remote_url
+
+    def get_remote_branch(self, path: Path) -> str:
+        """Return the remote of the current branch of the repo at path, or an empty str."""
+        remote_branch = ""
+        try:
+            result = subprocess.run(["git", "-C", path, "rev-parse", "--abbrev-ref", "--symbolic-full-name", "@{u}"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            remote_branch = result.stdout.decode("utf-8").replace("\n", "")
+        except subprocess.CalledProcessError:
+            return remote_branch
+
+        return remote_branch
+
+
+class GitConfig:
+    """Minimal parser for the git config file format, without support for include directives."""
+
+    escapes = {"n": "\n", "t": "\t", "b": "\b", "\\": "\\", "\"": "\""}
+
+    def __init__(self):
+        """Initialize an empty config."""
+        self.values = {}
+
+    def get(self, section: str, subsection: str, name: str) -> str:
+        """Return the last value of the given variable like git-config --get does, or None."""
+        values = self.values.get((section.lower(), subsection, name.lower()))
+        if not values:
+            return None
+        return values[-1]
+
+    def parse_file(self, config_path: Path):
+        """Parse the config file at config_path and add its values, a missing file is ignored."""
+        try:
+            with open(config_path, encoding='utf-8') as config_file:
+                content = config_file.read()
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            raise GitBackendUnsupported(f"cannot read \"{config_path}\": {e}") from e
+        section = None
+        for line in self.join_continuation_lines(content):
+            line = line.strip()
+            if line.startswith("["):
+                (section, line) = self.parse_section_header(line)
+                if section[0] in ("include", "includeif"):
+                    raise GitBackendUnsupported(f"\"{config_path}\" uses include directives")
+                line = line.strip()
+            if not line or line[0] in "#;":
+                continue
+            if section is None:
+                raise GitBackendUnsupported(f"\"{config_path}\" has a variable outside of a section")
+            (name, value) = self.parse_variable(line)
+            self.values.setdefault((section[0], section[1], name), []).append(value)
+
+    @classmethod
+    def join_continuation_lines(cls, content: str) -> list:
+        """Join lines ending in an unescaped backslash with the following line."""
+        lines = []
+        current = ""
+        for line in content.split("\n"):
+            stripped = line.rstrip("\r")
+            backslashes = len(stripped) - len(stripped.rstrip("\\"))
+            if backslashes % 2 == 1:
+                current += stripped[:-1]
+                continue
+            lines.append(current + stripped)
+            current = ""
+        if current:
+            lines.append(current)
+        return lines
+
+    @classmethod
+    def parse_section_header(cls, line: str) -> tuple:
+        """Return ((section, subsection), rest of the line) of a line starting with a section header."""
+        end = line.find("]")
+        if end < 0:
+            raise GitBackendUnsupported(f"malformed section header \"{line}\"")
+        header = line[1:end]
+        rest = line[end + 1:]
+        if "\"" in header:
+            (section, _, quoted) = header.partition(" ")
+            quoted = quoted.strip()
+            if len(quoted) < 2 or not quoted.startswith("\"") or not quoted.endswith("\""):
+                raise GitBackendUnsupported(f"malformed section header \"{line}\"")
+            subsection = ""
+            escaped = False
+            for char in quoted[1:-1]:
+                if escaped:
+                    subsection += char
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                else:
+                    subsection += char
+            return ((section.strip().lower(), subsection), rest)
+        (section, _, subsection) = header.strip().partition(".")
+        # the deprecated [section.subsection] syntax has a case-insensitive subsection
+        return ((section.lower(), subsection.lower() if subsection else None), rest)
+
+    @classmethod
+    def parse_variable(cls, line: str) -> tuple:
+        """Return the lowercase name and the unquoted value of a variable line."""
+        (name, separator, raw_value) = line.partition("=")
+        name = name.strip().lower()
+        if not name or not all(char.isalnum() or char == "-" for char in name):
+            raise GitBackendUnsupported(f"malformed variable \"{line}\"")
+        if not separator:
+            # a variable without a value is a boolean true
+            return (name, "true")
+        value = ""
+        pending_space = ""
+        in_quotes = False
+        escaped = False
+        for char in raw_value.strip():
+            if escaped:
+                if char not in cls.escapes:
+                    raise GitBackendUnsupported(f"unknown escape sequence in \"{line}\"")
+                value += pending_space + cls.escapes[char]
+                pending_space = ""
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == "\"":
+                value += pending_space
+                pending_space = ""
+                in_quotes = not in_quotes
+            elif not in_quotes and char in "#;":
+                break
+            elif not in_quotes and char in " \t":
+                pending_space += char
+            else:
+                value += pending_space + char
+                pending_space = ""
+        if in_quotes or escaped:
+            raise GitBackendUnsupported(f"malformed value in \"{line}\"")
+        return (name, value)
+
+
+class FileGitBackend(GitBackend):
+    """
+    Answer queries by reading HEAD, refs, packed-refs and the config from the repository files.
+
+    Worktrees and submodules with a .git file containing a gitdir: line are supported.
+    Everything else, for example a path inside a repository, the reftable ref storage or config files
+    using include directives, is passed on to the fallback backend.
+    """
+
+    def __init__(self, fallback: GitBackend):
+        """Initialize the backend with the backend that answers queries this backend cannot answer."""
+        self.fallback = fallback
+
+    @classmethod
+    def read_text(cls, path: Path) -> str:
+        """Return the stripped content of the file at path or None if it does not exist."""
+        try:
+            with open(path, encoding='utf-8') as text_file:
+                return text_file.read().strip()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except (OSError, ValueError) as e:
+            raise GitBackendUnsupported(f"cannot read \"{path}\": {e}") from e
+
+    @classmethod
+    def get_git_dirs(cls, path: Path) -> tuple:
+        """Return the git dir and the common dir of the repository whose top-level directory is path."""
+        if "GIT_DIR" in os.environ or "GIT_COMMON_DIR" in os.environ:
+            raise GitBackendUnsupported("GIT_DIR or GIT_COMMON_DIR is set")
+        dot_git = Path(path) / ".git"
+        if dot_git.is_dir():
+            git_dir = dot_git
+        elif dot_git.is_file():
+            gitdir_line = cls.read_text(dot_git) or ""
+            if not gitdir_line.startswith("gitdir:"):
+                raise GitBackendUnsupported(f"\"{dot_git}\" does not contain a gitdir: line")
+            git_dir = Path(path) / gitdir_line[len("gitdir:"):].strip()
+        else:
+            raise GitBackendUnsupported(f"\"{path}\" is not the top-level directory of a repository")
+        if not (git_dir / "HEAD").is_file():
+            raise GitBackendUnsupported(f"\"{git_dir}\" is not a git dir")
+        common_dir = git_dir
+        commondir_line = cls.read_text(git_dir / "commondir")
+        if commondir_line:
+            common_dir = git_dir / commondir_line
+        return (git_dir, common_dir)
+
+    @classmethod
+    def get_config(cls, git_dir: Path, common_dir: Path) -> GitConfig:
+        """Return the repository config, including the worktree specific config if it is enabled."""
+        config = GitConfig()
+        config.parse_file(common_dir / "config")
+        ref_storage = config.get("extensions", None, "refstorage")
+        if ref_storage and ref_storage != "files":
+            raise GitBackendUnsupported(f"ref storage \"{ref_storage}\" is not supported")
+        if (config.get("extensions", None, "worktreeconfig") or "false").lower() in ("true", "yes", "on", "1"):
+            config.parse_file(git_dir / "config.worktree")
+        return config
+
+    @classmethod
+    def read_head(cls, git_dir: Path) -> str:
+        """Return the content of HEAD, which either is "ref: <refname>" or an object id."""
+        head = cls.read_text(git_dir / "HEAD")
+        if not head:
+            raise GitBackendUnsupported(f"\"{git_dir}\" has an empty HEAD")
+        return head
+
+    @classmethod
+    def read_ref(cls, git_dir: Path, common_dir: Path, refname: str) -> str:
+        """Return the content of the given ref from a loose ref file or packed-refs, or None if it does not exist."""
+        # only HEAD-like refs and refs/worktree, refs/bisect and refs/rewritten are per worktree
+        per_worktree = refname.startswith(("refs/worktree/", "refs/bisect/", "refs/rewritten/")) or "/" not in refname
+        ref_dir = git_dir if per_worktree else common_dir
+        loose_ref = cls.read_text(ref_dir / refname)
+        if loose_ref is not None:
+            return loose_ref
+        packed_refs = cls.read_text(common_dir / "packed-refs")
+        for line in (packed_refs or "").splitlines():
+            if not line or line[0] in "#^":
+                continue
+            (oid, _, packed_refname) = line.partition(" ")
+            if packed_refname == refname:
+                return oid
+        return None
+
+    @classmethod
+    def resolve_ref(cls, git_dir: Path, common_dir: Path, content: str) -> str:
+        """Follow symbolic refs starting with the given ref content and return the object id or None."""
+        for _ in range(5):
+            if not content.startswith("ref:"):
+                return content
+            content = cls.read_ref(git_dir, common_dir, content[len("ref:"):].strip())
+            if content is None:
+                return None
+        raise GitBackendUnsupported("symbolic ref chain is too long")
+
+    def query(self, query_name: str, path: Path, query):
+        """Return the result of query for the repo at path, asking the fallback backend if it is unsupported."""
+        try:
+            return query(*self.get_git_dirs(path))
+        except GitBackendUnsupported as e:
+            log.debug(f"\"{Path(path).name}\": using fallback for {query_name}: {e}")
+            return getattr(self.fallback, query_name)(path)
+
+    def get_branch(self, path: Path) -> str:
+        """Return the current branch of the repo at path, or an empty str."""
+        def branch_from_head(git_dir: Path, _common_dir: Path) -> str:
+            head = self.read_head(git_dir)
+            if not head.startswith("ref:"):
+                return ""
+            refname = head[len("ref:"):].strip()
+            if not refname.startswith("refs/heads/"):
+                raise GitBackendUnsupported(f"HEAD points to \"{refname}\" outside of refs/heads")
+            return refname[len("refs/heads/"):]
+        return self.query("get_branch", path, branch_from_head)
+
+    def get_current_rev(self, path: Path) -> str:
+        """Return the currently checked out ref of the repo at path, or an empty str."""
+        def rev_from_head(git_dir: Path, common_dir: Path) -> str:
+            rev = self.resolve_ref(git_dir, common_dir, self.read_head(git_dir))
+            if rev is None:
+                return ""
+            if len(rev) not in (40, 64) or not all(char in "0123456789abcdef" for char in rev):
+                raise GitBackendUnsupported(f"\"{rev}\" is not an object id")
+            return rev
+        return self.query("get_current_rev", path, rev_from_head)
+
+    def is_detached(self, path: Path) -> bool:
+        """Check if the git repo at path is in detached HEAD state."""
+        def detached_head(git_dir: Path, _common_dir: Path) -> bool:
+            return not self.read_head(git_dir).startswith("ref:")
+        return self.query("is_detached", path, detached_head)
+
+    def get_remote_url(self, path: Path) -> str:
+        """Return the remote url of the repo at path, or an empty str."""
+        def remote_url_from_config(git_dir: Path, common_dir: Path) -> str:
+            return self.get_config(git_dir, common_dir).get("remote", "origin", "url") or ""
+        return self.query("get_remote_url", path, remote_url_from_config)
+
+    def get_remote_branch(self, path: Path) -> str:
+        """Return the remote of the current branch of the repo at path, or an empty str."""
+        def remote_branch_from_config(git_dir: Path, common_dir: Path) -> str:
+            head = self.read_head(git_dir)
+            if not head.startswith("ref: refs/heads/"):
+                return ""
+            branch = head[len("ref: refs/heads/"):]
+            config = self.get_config(git_dir, common_dir)
+            remote = config.get("branch", branch, "remote")
+            merge = config.get("branch", branch, "merge")
+            if not remote or not merge:
+                return ""
+            if remote == ".":
+                upstream_ref = merge
+            else:
+                if not merge.startswith("refs/heads/"):
+                    raise GitBackendUnsupported(f"upstream \"{merge}\" is not a branch")
+                fetch_refspec = config.get("remote", remote, "fetch")
+                if fetch_refspec != f"+refs/heads/*:refs/remotes/{remote}/*":
+                    raise GitBackendUnsupported(f"non-default fetch refspec \"{fetch_refspec}\"")
+                upstream_ref = f"refs/remotes/{remote}/{merge[len('refs/heads/'):]}"
+            if self.read_ref(git_dir, common_dir, upstream_ref) is None:
+                return ""
+            for prefix in ("refs/heads/", "refs/remotes/"):
+                if upstream_ref.startswith(prefix):
+                    short_ref = upstream_ref[len(prefix):]
+                    # git-rev-parse disambiguates short names that also match another ref
+                    for candidate in (f"refs/{short_ref}", f"refs/tags/{short_ref}", f"refs/heads/{short_ref}",
+                                      f"refs/remotes/{short_ref}", f"refs/remotes/{short_ref}/HEAD"):
+                        if candidate != upstream_ref and self.read_ref(git_dir, common_dir, candidate) is not None:
+                            raise GitBackendUnsupported(f"\"{short_ref}\" is ambiguous")
+                    return short_ref
+            raise GitBackendUnsupported(f"upstream \"{upstream_ref}\" cannot be abbreviated")
+        return self.query("get_remote_branch", path, remote_branch_from_config)
+
+
+def create_backend() -> GitBackend:
+    """Return the default backend, EVEREST_EDM_GIT_BACKEND=subprocess disables reading repository files directly."""
+    subprocess_backend = SubprocessGitBackend()
+    if os.environ.get("EVEREST_EDM_GIT_BACKEND") == "subprocess":
+        return subprocess_backend
+    return FileGitBackend(subprocess_backend)
@@ -0,0 +1,23 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+# Copyright Pionix GmbH and Contributors to EVerest
+#
+"""YAML input and output of edm_tool, using the libyaml based loader and dumper if PyYAML was built with them."""
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader
+    from yaml import SafeDumper
+
+
+def safe_load(stream):
+    """Parse the yaml document in stream like yaml.safe_load, raises yaml.YAMLError on errors."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None):
+    """Serialize data as yaml into stream like yaml.dump, or return it as str if stream is None."""
+    return yaml.dump(data, stream, Dumper=SafeDumper)
@@ -0,0 +1,142 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+# Copyright Pionix GmbH and Contributors to EVerest
+#
+"""Compare the answers of FileGitBackend with those of SubprocessGitBackend."""
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from edm_tool.git_backend import FileGitBackend, GitBackend, SubprocessGitBackend
+
+
+queries = ["get_branch", "get_current_rev", "is_detached", "get_remote_url", "get_remote_branch"]
+
+
+class NoFallbackBackend(GitBackend):
+    """Backend failing every query, to check that FileGitBackend answers without a fallback."""
+
+    def get_branch(self, path: Path) -> str:
+        raise AssertionError(f"fallback used for get_branch of {path}")
+
+    def get_current_rev(self, path: Path) -> str:
+        raise AssertionError(f"fallback used for get_current_rev of {path}")
+
+    def is_detached(self, path: Path) -> bool:
+        raise AssertionError(f"fallback used for is_detached of {path}")
+
+    def get_remote_url(self, path: Path) -> str:
+        raise AssertionError(f"fallback used for get_remote_url of {path}")
+
+    def get_remote_branch(self, path: Path) -> str:
+        raise AssertionError(f"fallback used for get_remote_branch of {path}")
+
+
+def git(path: Path, *args) -> str:
+    """Run git in path and return its stripped output."""
+    result = subprocess.run(["git", "-C", str(path)] + list(args),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return result.stdout.decode("utf-8").strip()
+
+
+def assert_same_answers(path: Path, fallback: GitBackend):
+    """Assert that both backends give the same answers for the repo at path."""
+    file_backend = FileGitBackend(fallback)
+    subprocess_backend = SubprocessGitBackend()
+    for query in queries:
+        assert getattr(file_backend, query)(path) == getattr(subprocess_backend, query)(path), query
+
+
+@pytest.fixture(name="clone")
+def fixture_clone(tmp_path: Path, monkeypatch) -> Path:
+    """Return a clone of a repository with a main and a feature branch and a tag, tracking its origin."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for variable in ["GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"]:
+        monkeypatch.setenv(variable, "edm")
+    for variable in ["GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"]:
+        monkeypatch.setenv(variable, "edm@example.com")
+    monkeypatch.delenv("GIT_DIR", raising=False)
+    monkeypatch.delenv("EVEREST_EDM_GIT_BACKEND", raising=False)
+    origin = tmp_path / "origin"
+    origin.mkdir()
+    git(origin, "init", "-q", "-b", "main")
+    git(origin, "commit", "-q", "--allow-empty", "-m", "first")
+    git(origin, "tag", "-a", "-m", "release", "v1.0")
+    git(origin, "branch", "feature/x")
+    git(origin, "commit", "-q", "--allow-empty", "-m", "second")
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", str(origin), str(clone))
+    git(clone, "checkout", "-q", "feature/x")
+    git(clone, "checkout", "-q", "main")
+    return clone
+
+
+def test_branch_with_upstream(clone: Path):
+    assert_same_answers(clone, NoFallbackBackend())
+    assert FileGitBackend(NoFallbackBackend()).get_remote_branch(clone) == "origin/main"
+
+
+def test_branch_without_upstream(clone: Path):
+    git(clone, "checkout", "-q", "-b", "local")
+    assert_same_answers(clone, NoFallbackBackend())
+
+
+def test_packed_refs(clone: Path):
+    git(clone, "checkout", "-q", "feature/x")
+    git(clone, "pack-refs", "--all")
+    assert not (clone / ".git" / "refs" / "heads" / "feature" / "x").exists()
+    assert_same_answers(clone, NoFallbackBackend())
+
+
+def test_detached_head(clone: Path):
+    git(clone, "checkout", "-q", "--detach", "v1.0")
+    assert_same_answers(clone, NoFallbackBackend())
+    assert FileGitBackend(NoFallbackBackend()).is_detached(clone)
+
+
+def test_unborn_branch(tmp_path: Path, clone: Path):
+    repo = tmp_path / "empty"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    assert_same_answers(repo, NoFallbackBackend())
+
+
+def test_worktree(tmp_path: Path, clone: Path):
+    worktree = tmp_path / "worktree"
+    git(clone, "worktree", "add", "-q", "-b", "work", str(worktree), "origin/main")
+    assert (worktree / ".git").is_file()
+    assert_same_answers(worktree, NoFallbackBackend())
+    git(worktree, "checkout", "-q", "--detach")
+    assert_same_answers(worktree, NoFallbackBackend())
+    assert_same_answers(clone, NoFallbackBackend())
+
+
+def test_bare_repo_uses_fallback(tmp_path: Path, clone: Path):
+    bare = tmp_path / "bare.git"
+    git(tmp_path, "clone", "-q", "--bare", str(clone), str(bare))
+    assert_same_answers(bare, SubprocessGitBackend())
+
+
+def test_config_with_include_uses_fallback(tmp_path: Path, clone: Path):
+    included = tmp_path / "included.gitconfig"
+    included.write_text("[remote \"origin\"]\n\turl = file:///included\n", encoding="utf-8")
+    git(clone, "config", "include.path", str(included))
+    assert_same_answers(clone, SubprocessGitBackend())
+    assert FileGitBackend(SubprocessGitBackend()).get_remote_url(clone) == "file:///included"
+
+
+def test_quoted_sections_and_values(clone: Path):
+    with open(clone / ".git" / "config", "a", encoding="utf-8") as config_file:
+        config_file.write("[remote \"origin\"]\n"
+                          "\turl = \"file:///path with spaces\" ; comment\n"
+                          "[branch \"feature/x\"]\n"
+                          "\tremote = origin\n"
+                          "\tmerge = refs/heads/feature/x\n"
+                          "[Branch \"Quoted \\\"name\\\"\"]\n"
+                          "\tremote = origin\n")
+    git(clone, "checkout", "-q", "feature/x")
+    assert_same_answers(clone, NoFallbackBackend())
+    assert FileGitBackend(NoFallbackBackend()).get_remote_url(clone) == "file:///path with spaces"
+    assert FileGitBackend(NoFallbackBackend()).get_remote_branch(clone) == "origin/feature/x"
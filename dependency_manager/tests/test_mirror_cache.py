@@ -0,0 +1,155 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+# Copyright Pionix GmbH and Contributors to EVerest
+#
+"""Create, reuse and prune mirrors of file:// remotes with MirrorCache."""
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from edm_tool import edm
+
+
+def git(path: Path, *args) -> str:
+    """Run git in path and return its stripped output."""
+    result = subprocess.run(["git", "-C", str(path)] + list(args),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return result.stdout.decode("utf-8").strip()
+
+
+def create_remote(tmp_path: Path, name: str) -> str:
+    """Create a bare repository with a tagged commit on main and return its file:// url."""
+    work = tmp_path / f"{name}-work"
+    work.mkdir()
+    git(work, "init", "-q", "-b", "main")
+    (work / "README.md").write_text(f"{name}\n", encoding="utf-8")
+    git(work, "add", "README.md")
+    git(work, "commit", "-q", "-m", "first")
+    git(work, "tag", "-a", "-m", "release", "v1.0")
+    remote = tmp_path / f"{name}.git"
+    git(tmp_path, "clone", "-q", "--bare", str(work), str(remote))
+    return remote.as_uri()
+
+
+def push_commit(tmp_path: Path, name: str, message: str) -> str:
+    """Commit to main of the remote created by create_remote and return the new rev."""
+    work = tmp_path / f"{name}-work"
+    git(work, "commit", "-q", "--allow-empty", "-m", message)
+    git(work, "push", "-q", str(tmp_path / f"{name}.git"), "main")
+    return git(work, "rev-parse", "HEAD")
+
+
+@pytest.fixture(autouse=True)
+def fixture_git_environment(tmp_path: Path, monkeypatch):
+    """Isolate git from the configuration of the user running the tests."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for variable in ["GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"]:
+        monkeypatch.setenv(variable, "edm")
+    for variable in ["GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"]:
+        monkeypatch.setenv(variable, "edm@example.com")
+    monkeypatch.delenv("GIT_DIR", raising=False)
+
+
+@pytest.fixture(name="cache")
+def fixture_cache(tmp_path: Path) -> edm.MirrorCache:
+    """Return a shared mirror cache in an empty directory."""
+    return edm.MirrorCache(tmp_path / "mirrors", shared=True)
+
+
+def test_normalize_url():
+    assert (edm.MirrorCache.normalize_url("git@github.com:EVerest/everest-core.git") ==
+            edm.MirrorCache.normalize_url("https://github.com/EVerest/everest-core/"))
+    assert edm.MirrorCache.normalize_url("file:///srv/git/repo.git") == "/srv/git/repo"
+
+
+def test_mirror_is_created_and_updated(tmp_path: Path, cache: edm.MirrorCache):
+    url = create_remote(tmp_path, "origin")
+    mirror_path = cache.get_mirror(url)
+    assert mirror_path == cache.get_mirror_path(url)
+    assert git(mirror_path, "rev-parse", "--is-bare-repository") == "true"
+    assert git(mirror_path, "config", "uploadpack.allowFilter") == "true"
+    assert git(mirror_path, "rev-parse", "v1.0^{commit}") == git(tmp_path / "origin-work", "rev-parse", "v1.0^{commit}")
+    assert [mirror["url"] for mirror in cache.get_mirrors()] == [url]
+
+    rev = push_commit(tmp_path, "origin", "second")
+    # every mirror is fetched at most once per run
+    assert cache.get_mirror(url) == mirror_path
+    assert git(mirror_path, "rev-parse", "main") != rev
+    assert edm.MirrorCache(cache.path).get_mirror(url) == mirror_path
+    assert git(mirror_path, "rev-parse", "main") == rev
+
+
+def test_unreachable_remote_has_no_mirror(tmp_path: Path, cache: edm.MirrorCache):
+    assert cache.get_mirror((tmp_path / "missing.git").as_uri()) is None
+    assert cache.get_mirrors() == []
+
+
+def test_shared_clone_borrows_objects(tmp_path: Path, cache: edm.MirrorCache):
+    url = create_remote(tmp_path, "origin")
+    checkout_dir = tmp_path / "workspace" / "origin"
+    result = edm.checkout_local_dependency("origin", url, "v1.0", None, checkout_dir, mirror_cache=cache)
+    assert result["update"] == "cloned"
+    mirror_path = cache.get_mirror_path(url)
+    alternates = (checkout_dir / ".git" / "objects" / "info" / "alternates").read_text(encoding="utf-8")
+    assert (mirror_path / "objects").as_posix() in alternates.split("\n")
+    assert git(checkout_dir, "remote", "get-url", "origin") == url
+    assert git(checkout_dir, "describe", "--tags") == "v1.0"
+    assert edm.MirrorCache.get_references(mirror_path) == [checkout_dir]
+
+    # a second clone reuses the mirror
+    other_dir = tmp_path / "other-workspace" / "origin"
+    edm.checkout_local_dependency("origin", url, "main", None, other_dir, mirror_cache=cache)
+    assert len(cache.get_mirrors()) == 1
+    assert sorted(edm.MirrorCache.get_references(mirror_path)) == sorted([checkout_dir, other_dir])
+
+
+def test_prune_keeps_borrowed_mirrors(tmp_path: Path, cache: edm.MirrorCache):
+    url = create_remote(tmp_path, "origin")
+    checkout_dir = tmp_path / "workspace" / "origin"
+    edm.checkout_local_dependency("origin", url, "v1.0", None, checkout_dir, mirror_cache=cache)
+    assert cache.prune(remove_all=True) == []
+    assert cache.get_mirror_path(url).exists()
+
+    assert edm.MirrorCache.dissociate(checkout_dir)
+    assert [mirror["url"] for mirror in cache.prune(remove_all=True)] == [url]
+    assert not cache.get_mirror_path(url).exists()
+    git(checkout_dir, "fsck", "--no-progress")
+    assert git(checkout_dir, "describe", "--tags") == "v1.0"
+
+
+def test_prune_by_age_and_size(tmp_path: Path, cache: edm.MirrorCache):
+    old_url = create_remote(tmp_path, "old")
+    new_url = create_remote(tmp_path, "new")
+    old_mirror = cache.get_mirror(old_url)
+    cache.get_mirror(new_url)
+    last_used = time.time() - 3 * 24 * 60 * 60
+    os.utime(old_mirror / edm.MirrorCache.last_used_file_name, (last_used, last_used))
+
+    assert cache.prune(max_age=5) == []
+    assert [mirror["url"] for mirror in cache.prune(max_age=2)] == [old_url]
+
+    cache.get_mirror(old_url)
+    os.utime(old_mirror / edm.MirrorCache.last_used_file_name, (last_used, last_used))
+    new_size = cache.get_mirrors()[0]["size"]
+    assert [mirror["url"] for mirror in cache.prune(max_size=new_size)] == [old_url]
+    assert [mirror["url"] for mirror in cache.get_mirrors()] == [new_url]
+
+
+def test_parse_size():
+    assert edm.parse_size("20G") == 20 << 30
+    assert edm.parse_size("1.5k") == 1536
+    assert edm.parse_size("512") == 512
+    with pytest.raises(ValueError):
+        edm.parse_size("10X")
+
+
+def test_prune_rejects_invalid_max_size(capsys):
+    parser = edm.get_parser("test")
+    assert parser.parse_args(["cache", "prune", "--max-size", "1M"]).max_size == 1 << 20
+    with pytest.raises(SystemExit):
+        parser.parse_args(["cache", "prune", "--max-size", "10X"])
+    assert "--max-size" in capsys.readouterr().err
@@ -0,0 +1,37 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+# Copyright Pionix GmbH and Contributors to EVerest
+#
+"""Compare yaml_io, which may use the libyaml loader and dumper, with the pure python yaml.safe_load and yaml.dump."""
+from pathlib import Path
+
+import pytest
+import yaml
+
+from edm_tool import yaml_io
+
+
+yaml_paths = sorted(Path(__file__).resolve().parents[2].glob("*.yaml"))
+
+
+def test_yaml_files_found():
+    assert yaml_paths
+
+
+@pytest.mark.parametrize("path", yaml_paths, ids=lambda path: path.name)
+def test_same_data_and_dump(path: Path):
+    text = path.read_text(encoding="utf-8")
+    data = yaml_io.safe_load(text)
+    assert data == yaml.safe_load(text)
+    assert yaml_io.dump(data) == yaml.dump(data)
+    assert yaml_io.safe_load(yaml_io.dump(data)) == data
+
+
+@pytest.mark.parametrize("path", yaml_paths, ids=lambda path: path.name)
+def test_same_dump_to_stream(tmp_path: Path, path: Path):
+    data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    with open(tmp_path / "io.yaml", "w", encoding="utf-8") as yaml_file:
+        assert yaml_io.dump(data, yaml_file) is None
+    with open(tmp_path / "pure.yaml", "w", encoding="utf-8") as yaml_file:
+        yaml.dump(data, yaml_file)
+    assert (tmp_path / "io.yaml").read_text(encoding="utf-8") == (tmp_path / "pure.yaml").read_text(encoding="utf-8")